@@ -1,66 +1,54 @@
 from FaultTree.FaultTree import *
 from Algorithms.Cost.CuDAcost import *
 from DDT.DDT import *
+from Algorithms.Memo import LRUCache
 
 
-def BarraCuDA(ft, BUDADEPTH, depth=0):
-    ddt = BarraCuDA_algorithm(ft, BUDADEPTH, depth)
-    return ddt.remove_duplicate_vertices()
-    # return ddt
-
-
-def BarraCuDA_algorithm(ft, BUDADEPTH, depth=0):
+def BarraCuDA(ft, BUDADEPTH, depth=0, cache=None):
+    """
+    :param ft: the fault tree that needs to be performed
+    :param BUDADEPTH: number of levels of gates that are composed bottom-up, deeper subtrees are solved by CuDAcost
+    :param depth: level of ft in the whole fault tree
+    :param cache: LRUCache of subtree DDTs, None for a cache that only lives during this call
+    :return: diagnostic decision tree without duplicate tests
+    """
+    if cache is None:
+        cache = LRUCache(None)
+    # the DDT of a subtree only depends on the number of levels left for the bottom-up composition, and not on
+    # levels beyond the gates of the subtree: a shared subtree is solved once, also when it is reached at
+    # different depths that leave enough levels for all of its gates.
+    # The subtree is kept in the entry so that its id is not reused while the entry exists.
+    levels = min(BUDADEPTH - depth, ft.max_height() - 1)
+    key = (id(ft), FT._generation, max(levels, 0))
+    entry = cache.get(key)
+    if entry is None:
+        ddt = BarraCuDA_algorithm(ft, BUDADEPTH, depth, cache).remove_duplicate_vertices()
+        entry = (ft, ddt)
+        cache.put(key, entry)
+    return entry[1]
+
+
+def BarraCuDA_algorithm(ft, BUDADEPTH, depth=0, cache=None):
     """
     This is an algorithm for transforming fault trees to diagnostic decision trees using a bottom-up approach
     :param ft: the fault tree that needs to be performed
+    :param cache: LRUCache of subtree DDTs, see BarraCuDA
     :return: diagnostic decision tree
     """
     if ft.type == FtElementType.BE:
-        return DDT(
-            name=ft.name,
-            ddtelement=DdtElementType.DEC,
-            children=[
-                DDT('ZERO', DdtElementType.ZERO),
-                DDT('ONE', DdtElementType.ONE)
-            ],
-            prob=ft.prob,
-            cost=ft.cost
-        )
+        return ddt_node(ft.name, ddt_leaf(DdtElementType.ZERO), ddt_leaf(DdtElementType.ONE), prob=ft.prob, cost=ft.cost)
 
     if depth < BUDADEPTH:
-        subtrees  = [BarraCuDA(ch, BUDADEPTH, depth+1) for ch in ft.children]
+        subtrees  = [BarraCuDA(ch, BUDADEPTH, depth+1, cache) for ch in ft.children]
         if ft.type == FtElementType.AND:
             ordered_children = sorted(subtrees, key=lambda x: x.expected_cost() / (1 - x.fail_prob()))
-            new_ddt = ordered_children[0]
-            for i in range(1, len(ordered_children)):
-                new_ddt = replace_leaves(new_ddt, DdtElementType.ONE, ordered_children[i])
-            return new_ddt
+            return compose(ordered_children, DdtElementType.ONE)
 
         if ft.type == FtElementType.OR:
             ordered_children = sorted(subtrees, key=lambda x: x.expected_cost()/x.fail_prob())
-            new_ddt = ordered_children[0]
-            for i in range(1, len(ordered_children)):
-                new_ddt = replace_leaves(new_ddt, DdtElementType.ZERO, ordered_children[i])
-            return new_ddt
+            return compose(ordered_children, DdtElementType.ZERO)
 
     else:
         cutsets = ft.cut_set()
         ddt = CuDAcost(ft, cutsets)
         return ddt
-
-def replace_leaves(ddt, target_type, replacement):
-    if ddt.type == target_type:
-        return replacement
-
-    if ddt.type == DdtElementType.DEC:
-        new_children = [replace_leaves(child, target_type, replacement) for child in ddt.children]
-        return DDT(
-            name=ddt.name,
-            ddtelement=DdtElementType.DEC,
-            children=new_children,
-            prob=ddt.prob,
-            cost=ddt.cost
-        )
-
-    return ddt
-
@@ -1,55 +1,77 @@
-
+from math import inf
+import numpy as np
 from DDT.DDT import *
+from Algorithms.CutSets import as_family, log_weight
+from Algorithms.Memo import MEMO_SIZE
 
 
-def PaDAcost(ft, pathsets):
-    if not pathsets:
-        return DDT('ONE', DdtElementType.ONE)
-    if [] in pathsets:
-        return DDT('ZERO', DdtElementType.ZERO)
+def PaDAcost(ft, pathsets, memo_size=MEMO_SIZE):
+    ft = ft.compile()
+    pathsets = as_family(pathsets)
+    if not len(pathsets):
+        return ddt_leaf(DdtElementType.ONE)
+    if pathsets.has_empty_set():
+        return ddt_leaf(DdtElementType.ZERO)
     else:
-        current_ps = find_min_path_set(ft, pathsets)
-        var = find_max_var(ft, current_ps)
-        ftvar = ft.find_vertex_by_name(var)
-        return DDT(var, ddtelement=DdtElementType.DEC, children=[PaDAcost(ft, remove_var(pathsets, var)), PaDAcost(ft, remove_ps(pathsets, var))], prob=ftvar.prob, cost=ftvar.cost)
+        # the same residual family is reached by testing variables in different orders
+        memo = pathsets.memo(("PaDAcost", ft), memo_size)
+        key = pathsets.key()
+        ddt = memo.get(key)
+        if ddt is None:
+            current_ps = find_min_path_set(ft, pathsets)
+            var = find_max_var(ft, current_ps)
+            ddt = ddt_node(var, PaDAcost(ft, remove_var(pathsets, var), memo_size),
+                           PaDAcost(ft, remove_ps(pathsets, var), memo_size),
+                           prob=ft.prob_of(var), cost=ft.cost_of(var))
+            memo.put(key, ddt)
+        return ddt
 
 
 def remove_var(pathsets, remove):
-    updated_pathsets = [
-        [e for e in pathset if e != remove]
-        for pathset in pathsets
-    ]
-    return updated_pathsets
+    return pathsets.without_variable(remove)
 
 
 def remove_ps(pathsets, event):
-    updated_pathsets = [pathset for pathset in pathsets if event not in pathset]
-    return updated_pathsets
+    return pathsets.without_sets_containing(event)
 
 
 def find_max_var(ft, current_ps):
+    ft = ft.compile()
     prob = float('inf')
     max_var = None
     for var in current_ps:
-        current = ft.find_vertex_by_name(var)
-        if current.cost/(current.prob) < prob:
-            prob = current.cost/(current.prob)
-            max_var = current.name
+        ratio = ft.cost_of(var)/ft.prob_of(var)
+        if ratio < prob:
+            prob = ratio
+            max_var = var
     return max_var
 
 
 def find_min_path_set(ft, pathsets):
-    maxP = float('inf')
-    pathset = None
-    for ps in pathsets:
-        P = 1
-        C = 0
-        for vertex in ps:
-            current = ft.find_vertex_by_name(vertex)
-            P *= (1-current.prob)
-            C += current.cost
-        comp = C/P
-        if comp < maxP:
-            maxP = P
-            pathset = ps
-    return pathset
\ No newline at end of file
+    """
+    :param pathsets: SetFamily of path sets
+    :return: path set selected as in the original PaDAcost: the sets are scanned in order and a set is taken when
+        the ratio of its cost to the probability that none of its events fails is below the probability (not the
+        ratio) of the set taken before
+    """
+    ft = ft.compile()
+    log_prob = pathsets.row_sums(("log_prob_working", ft), lambda var: log_weight(1 - ft.prob_of(var)))
+    cost = pathsets.row_sums(("cost", ft), ft.cost_of)
+    # compared as logarithms, the probability of a large path set underflows
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_ratio = np.log(cost) - log_prob
+    # every step jumps to the next set that is taken, usually only the first one or two sets are
+    row = None
+    threshold = inf
+    start = 0
+    while True:
+        taken = np.flatnonzero(log_ratio[start:] < threshold)
+        if not len(taken):
+            break
+        row = start + int(taken[0])
+        threshold = log_prob[row]
+        start = row + 1
+    if row is None and len(log_ratio):
+        # no set has a finite ratio, e.g. every set contains an event that always fails
+        row = 0
+    return None if row is None else pathsets.members(row)
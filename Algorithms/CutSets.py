@@ -0,0 +1,265 @@
+import heapq
+from math import inf, log
+import numpy as np
+from Algorithms.Memo import LRUCache
+
+
+WORD_BITS = 64
+# number of set bits of every byte, for numpy versions without np.bitwise_count (added in numpy 2.0)
+BYTE_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+class SetFamily:
+    """
+    Family of sets of basic events (cut sets or path sets) stored as a bit matrix: row i is set i, variable j is
+    bit j % 64 of word j // 64. The rows keep the order of the sets they were made from, removing sets or variables
+    is a single vectorised operation on the matrix and creates a new family, families are never changed in place.
+    Families derived from each other share the variable index and a dict (shared) with per-variable data that is
+    computed once for the whole recursion.
+    Per-set sums of per-variable weights (e.g. log-probabilities or costs, see row_sums) are carried along and
+    updated incrementally, so scoring all sets of a derived family is a single vector operation.
+    """
+    def __init__(self, variables, words):
+        """
+        :param variables: tuple of variable names, the position of a name is its bit index
+        :param words: uint64 array of shape (number of sets, number of words)
+        """
+        self.variables = variables
+        self.index = {name: i for i, name in enumerate(variables)}
+        self.words = words
+        self.shared = {}
+        self.sums = {}
+
+    @classmethod
+    def from_sets(cls, sets):
+        """
+        :param sets: list of lists of variable names
+        :return: family with the sets in the same order
+        """
+        index = {name: i for i, name in enumerate(variable_order(sets))}
+        masks = [sum(1 << index[name] for name in set(s)) for s in sets]
+        word_mask = (1 << WORD_BITS) - 1
+        words = np.zeros((len(sets), max(1, -(-len(index) // WORD_BITS))), dtype=np.uint64)
+        for w in range(words.shape[1]):
+            words[:, w] = [(mask >> (w * WORD_BITS)) & word_mask for mask in masks]
+        return cls(tuple(index), words)
+
+    def _with_words(self, words, sums):
+        family = SetFamily.__new__(SetFamily)
+        family.variables = self.variables
+        family.index = self.index
+        family.words = words
+        family.shared = self.shared
+        family.sums = sums
+        return family
+
+    def _bit(self, name):
+        i = self.index[name]
+        return i // WORD_BITS, np.uint64(1 << (i % WORD_BITS))
+
+    def __len__(self):
+        return self.words.shape[0]
+
+    def has_empty_set(self):
+        return len(self) > 0 and not self.words.any(axis=1).all()
+
+    def containing(self, name):
+        """
+        :return: boolean vector, True for the sets that contain name
+        """
+        if name not in self.index:
+            return np.zeros(len(self), dtype=bool)
+        word, bit = self._bit(name)
+        return (self.words[:, word] & bit) != 0
+
+    def without_sets_containing(self, name):
+        """
+        :return: family of the sets that do not contain name
+        """
+        keep = ~self.containing(name)
+        return self._with_words(self.words[keep], {key: sums[keep] for key, sums in self.sums.items()})
+
+    def without_variable(self, name):
+        """
+        :return: family where name is removed from every set
+        """
+        if name not in self.index:
+            return self
+        rows = self.containing(name)
+        i = self.index[name]
+        sums = {}
+        for key, row_sums in self.sums.items():
+            weight = self.shared[("weights", key)][i]
+            if np.isfinite(weight):
+                row_sums = row_sums.copy()
+                row_sums[rows] -= weight
+                sums[key] = row_sums
+            # sums with an infinite weight cannot be updated, they are recomputed when asked for
+        word, bit = self._bit(name)
+        words = self.words.copy()
+        words[:, word] &= ~bit
+        return self._with_words(words, sums)
+
+    def sizes(self):
+        if hasattr(np, "bitwise_count"):
+            return np.bitwise_count(self.words).sum(axis=1)
+        octets = np.ascontiguousarray(self.words).view(np.uint8)
+        return BYTE_POPCOUNT[octets].sum(axis=1)
+
+    def key(self):
+        """
+        :return: bytes identifying the family, equal for families with the same sets in the same order
+        """
+        return self.words.tobytes()
+
+    def memo(self, name, maxsize):
+        """
+        :param name: hashable naming the table, e.g. (algorithm, fault tree)
+        :param maxsize: maximum number of entries of the table when it is created
+        :return: LRU cache shared by all families derived from the same family
+        """
+        table = self.shared.get(("memo", name))
+        if table is None:
+            table = self.shared[("memo", name)] = LRUCache(maxsize)
+        return table
+
+    def incidence(self):
+        """
+        :return: boolean matrix of shape (number of sets, number of variables), True when the set has the variable
+        """
+        octets = self.words.astype('<u8', copy=False).view(np.uint8)
+        return np.unpackbits(octets, axis=1, bitorder='little')[:, :len(self.variables)].astype(bool)
+
+    def row_sums(self, key, weights):
+        """
+        :param key: hashable naming the weights, e.g. ("cost", ft)
+        :param weights: function (variable name) -> weight, called once per variable for all derived families
+        :return: float vector with the sum of the weights of the variables of every set
+        """
+        sums = self.sums.get(key)
+        if sums is None:
+            vector = self.shared.get(("weights", key))
+            if vector is None:
+                vector = np.array([weights(name) for name in self.variables], dtype=float)
+                self.shared[("weights", key)] = vector
+            with np.errstate(invalid='ignore'):
+                # a set without the variable contributes 0, also when its weight is infinite
+                sums = np.where(self.incidence(), vector, 0.0).sum(axis=1)
+            self.sums[key] = sums
+        return sums
+
+    def masks(self):
+        """
+        :return: list with every set as a Python int, bit i is variable i
+        """
+        masks = self.words[:, 0].tolist()
+        for w in range(1, self.words.shape[1]):
+            masks = [mask | (word << (w * WORD_BITS)) for mask, word in zip(masks, self.words[:, w].tolist())]
+        return masks
+
+    def mask(self, row):
+        """
+        :return: set row as a Python int
+        """
+        mask = 0
+        for w, word in enumerate(self.words[row].tolist()):
+            mask |= word << (w * WORD_BITS)
+        return mask
+
+    def members(self, row):
+        """
+        :return: names of the variables in set row, in index order
+        """
+        return [self.variables[i] for i in bits(self.mask(row))]
+
+    def to_lists(self):
+        return [[self.variables[i] for i in bits(mask)] for mask in self.masks()]
+
+
+def log_weight(x):
+    """
+    :return: natural logarithm of x, -inf for 0
+    """
+    return log(x) if x > 0 else -inf
+
+
+def best_row(scores, maximize=False):
+    """
+    :param scores: score of every set, NaN scores are ignored
+    :param maximize: look for the highest instead of the lowest score
+    :return: index of the first set with the best score, the first set when no set has a finite score, None when
+        there are no sets
+    """
+    if maximize:
+        scores = -scores
+    scores = np.where(np.isnan(scores), inf, scores)
+    if not len(scores):
+        return None
+    row = int(scores.argmin())
+    return row if np.isfinite(scores[row]) else 0
+
+
+def bits(mask):
+    """
+    :return: indices of the bits set in mask, lowest first
+    """
+    indices = []
+    while mask:
+        low = mask & -mask
+        indices.append(low.bit_length() - 1)
+        mask ^= low
+    return indices
+
+
+def variable_order(sets):
+    """
+    Orders the variables so that the variables of every set appear in the same order as in the set, when such an
+    order exists (cut sets and path sets enumerated from the BDD share one variable order). Ties, and variables that
+    would close a cycle when the sets disagree, are ordered by first appearance.
+    :param sets: list of lists of variable names
+    :return: list of variable names
+    """
+    first = {}
+    successors = {}
+    predecessors = {}
+    for s in sets:
+        for name in s:
+            if name not in first:
+                first[name] = len(first)
+                successors[name] = set()
+                predecessors[name] = 0
+        for a, b in zip(s, s[1:]):
+            if b not in successors[a]:
+                successors[a].add(b)
+                predecessors[b] += 1
+
+    order = []
+    placed = set()
+    ready = [(first[name], name) for name in first if predecessors[name] == 0]
+    heapq.heapify(ready)
+    while len(order) < len(first):
+        if not ready:
+            # the sets disagree on the order, release the first variable that is still waiting
+            name = min((name for name in first if name not in placed), key=first.get)
+            predecessors[name] = 0
+            heapq.heappush(ready, (first[name], name))
+        _, name = heapq.heappop(ready)
+        if name in placed:
+            continue
+        placed.add(name)
+        order.append(name)
+        for successor in successors[name]:
+            predecessors[successor] -= 1
+            if predecessors[successor] == 0 and successor not in placed:
+                heapq.heappush(ready, (first[successor], successor))
+    return order
+
+
+def as_family(sets):
+    """
+    :param sets: SetFamily or list of lists of variable names
+    :return: SetFamily
+    """
+    if isinstance(sets, SetFamily):
+        return sets
+    return SetFamily.from_sets(sets)
@@ -0,0 +1,388 @@
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from math import inf, nextafter
+from DDT.DDT import *
+from FaultTree.Traversal import postorder
+
+
+# objectives of the exact algorithms
+COST = "cost"
+HEIGHT = "height"
+
+
+class ExactSolver:
+    """
+    Computes a diagnostic decision tree with the minimal expected cost (or expected height) by dynamic programming
+    over the Boolean functions reached by fixing variables. Every restricted function is a node of the BDD of the
+    fault tree, which is canonical: orders of tests that lead to the same function share one subproblem, and each
+    distinct subfunction is solved once. Only variables the function depends on are candidate tests, testing any
+    other variable only adds its cost.
+
+    With branch_and_bound, subproblems are solved against a budget and candidates are skipped as soon as a lower
+    bound shows they cannot beat the best DDT found so far. The bound of a function f is
+    P(f) * (cheapest cut set of f) + (1 - P(f)) * (cheapest path set of f): a DDT only ends in a failure leaf after
+    the failed tested variables form a cut set, and in a working leaf after the working ones form a path set.
+    The initial budget is the expected cost (height) of the BUDAcost (BUDA) DDT.
+
+    With workers, the choices of the first test (split_depth=1) or of the first two tests (split_depth=2) are
+    independent tasks run by a process pool. Every worker process solves its tasks with its own solver, so
+    subproblems are shared between the tasks of one process. With branch_and_bound the best expected cost (height)
+    found so far is shared between the processes and every task starts from the budget it leaves.
+    """
+    def __init__(self, ft, variables, probabilities, cost, objective=COST, branch_and_bound=False, workers=None,
+                 split_depth=1):
+        """
+        :param ft: fault tree
+        :param variables: variables that may be tested, candidates are tried in this order and ties keep the first
+        :param probabilities: dict variable -> failure probability
+        :param cost: dict variable -> cost of testing the variable
+        :param objective: COST or HEIGHT
+        :param branch_and_bound: prune candidates with lower bounds
+        :param workers: number of processes, None solves in this process
+        :param split_depth: 1 or 2, number of levels of tests that are split into tasks when workers is given
+        """
+        if split_depth not in (1, 2):
+            raise ValueError("split_depth must be 1 or 2")
+        self.ft = ft
+        self.bdd = ft._decision_diagram()
+        self.probabilities = probabilities
+        self.cost = cost
+        self.objective = objective
+        self.branch_and_bound = branch_and_bound
+        self.workers = workers
+        self.split_depth = split_depth
+        self.candidates = [(var, 1 << self.bdd.level_of[var]) for var in variables if var in self.bdd.level_of]
+        self.memo = {0: (0, ddt_leaf(DdtElementType.ZERO)), 1: (0, ddt_leaf(DdtElementType.ONE))}
+
+        # lower bounds that are known for functions that were not solved because they exceeded their budget
+        self.lower = {}
+        self.bounds = {}
+        self.upper_bound = inf
+        self.expanded = 0
+        self.pruned = 0
+
+    def step(self, var):
+        return self.cost[var] if self.objective == COST else 1
+
+    def solve(self):
+        """
+        :return: optimal diagnostic decision tree, None if the fault tree depends on a variable that may not be tested
+        """
+        f = self.bdd.build(self.ft)
+        heuristic = None
+        if self.branch_and_bound:
+            heuristic = self._heuristic()
+            if heuristic is not None:
+                self.upper_bound = self._value(heuristic)
+
+        if self.workers is not None and f > 1:
+            ddt = self._solve_parallel(f)
+        elif self.branch_and_bound:
+            ddt = self._solve_bounded(f, self.upper_bound)[1]
+        else:
+            ddt = self._solve(f)[1]
+        # nothing beats the heuristic, so it is optimal
+        return ddt if ddt is not None else heuristic
+
+    def _solve(self, f):
+        """
+        :param f: BDD node
+        :return: (optimal expected cost or height, optimal DDT) of the function f
+        """
+        if f in self.memo:
+            return self.memo[f]
+        self.expanded += 1
+
+        best_value = inf
+        best = None
+        for var in self._candidates(f):
+            value, ddt0, ddt1 = self._candidate(f, var, best_value)
+            if value < best_value:
+                best_value = value
+                best = (var, ddt0, ddt1)
+        return self._store(f, best_value, best)
+
+    def _solve_bounded(self, f, budget):
+        """
+        :param f: BDD node
+        :param budget: only DDTs with a lower expected cost (height) are of interest
+        :return: (optimal value, optimal DDT) when the optimum is below budget, otherwise (lower bound, None) with a
+            lower bound of at least budget
+        """
+        if f in self.memo:
+            return self.memo[f]
+        bound = self._lower_bound(f)
+        if bound >= budget:
+            self.pruned += 1
+            return bound, None
+        if f in self.lower:
+            # the function exceeded a smaller budget before, solve it completely so it is not expanded a third time
+            budget = inf
+        self.expanded += 1
+
+        best_value = budget
+        best = None
+        for var in self._candidates(f):
+            value, ddt0, ddt1 = self._candidate(f, var, best_value)
+            if value < best_value:
+                best_value = value
+                best = (var, ddt0, ddt1)
+
+        if best is None:
+            # every candidate costs at least the budget
+            self.lower[f] = max(bound, budget)
+            return self.lower[f], None
+        return self._store(f, best_value, best)
+
+    def _candidates(self, f):
+        """
+        :return: names of the candidates the function f depends on, in the order of the candidates
+        """
+        support = self.bdd.support(f)
+        return [var for var, bit in self.candidates if support & bit]
+
+    def _candidate(self, f, var, budget):
+        """
+        Tests var first in a DDT for f
+        :param f: BDD node
+        :param var: candidate f depends on
+        :param budget: only used with branch_and_bound, skip the candidate when it cannot go below budget
+        :return: (expected cost or height, DDT when var is low, DDT when var is high), (inf, None, None) when the
+            candidate was skipped
+        """
+        p = self.probabilities[var]
+        step = self.step(var)
+        f0 = self.bdd.cofactor(f, var, 0)
+        f1 = self.bdd.cofactor(f, var, 1)
+        if not self.branch_and_bound:
+            value0, ddt0 = self._solve(f0)
+            value1, ddt1 = self._solve(f1)
+            return step + (1 - p) * value0 + p * value1, ddt0, ddt1
+
+        bound0 = self._lower_bound(f0)
+        bound1 = self._lower_bound(f1)
+        if step + (1 - p) * bound0 + p * bound1 >= budget:
+            self.pruned += 1
+            return inf, None, None
+
+        # budgets of the branches that still allow beating the budget
+        budget0 = (budget - step - p * bound1) / (1 - p) if p < 1 else inf
+        value0, ddt0 = self._solve_bounded(f0, budget0)
+        if ddt0 is None:
+            return inf, None, None
+        budget1 = (budget - step - (1 - p) * value0) / p if p > 0 else inf
+        value1, ddt1 = self._solve_bounded(f1, budget1)
+        if ddt1 is None:
+            return inf, None, None
+        return step + (1 - p) * value0 + p * value1, ddt0, ddt1
+
+    def _branch_budget(self, f, var, value, best):
+        """
+        :param f: BDD node
+        :param var: first test of a DDT for f
+        :param value: outcome of var
+        :param best: expected cost (height) the DDT for f has to beat
+        :return: budget for the DDT of the branch value of var
+        """
+        p = self.probabilities[var]
+        weight, other_weight = (p, 1 - p) if value else (1 - p, p)
+        if weight == 0:
+            return inf
+        other = self.bdd.cofactor(f, var, 1 - value)
+        return (best - self.step(var) - other_weight * self._lower_bound(other)) / weight
+
+    def _solve_parallel(self, f):
+        """
+        Splits the first split_depth levels of tests of f into tasks for a process pool and merges their results.
+        Ties are broken in the order of the candidates, as in the sequential algorithm.
+        :param f: BDD node of the fault tree, not a constant
+        :return: optimal DDT, None when nothing beats the upper bound
+        """
+        # a task is (assignments of the tests above, candidate), it yields (value, DDT low, DDT high)
+        tasks = []
+        branches = {}
+        for var in self._candidates(f):
+            if self.split_depth == 1:
+                tasks.append(((), var))
+                continue
+            for value in (0, 1):
+                g = self.bdd.cofactor(f, var, value)
+                branches[(var, value)] = self._candidates(g)
+                tasks.extend((((var, value),), second) for second in branches[(var, value)])
+
+        shared_best = mp.Value('d', self.upper_bound)
+        variables = [var for var, _ in self.candidates]
+        results = {}
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.ft, variables, self.probabilities, self.cost, self.objective,
+                                           self.branch_and_bound, shared_best)) as executor:
+            futures = [executor.submit(_run_task, *task) for task in tasks]
+            for future in as_completed(futures):
+                task, result, expanded, pruned = future.result()
+                results[task] = result
+                self.expanded += expanded
+                self.pruned += pruned
+
+                # share the expected cost (height) of a first test as soon as all its tasks are done
+                var = task[0][0][0] if task[0] else task[1]
+                value = self._merge(f, var, results, branches)
+                if value is not None and value[0] < shared_best.value:
+                    with shared_best.get_lock():
+                        shared_best.value = min(shared_best.value, value[0])
+
+        best_value = self.upper_bound
+        best = None
+        for var in self._candidates(f):
+            value = self._merge(f, var, results, branches)
+            if value is not None and value[0] < best_value:
+                best_value = value[0]
+                best = (var, value[1], value[2])
+        return self._store(f, best_value, best)[1]
+
+    def _merge(self, f, var, results, branches):
+        """
+        :return: (value, DDT low, DDT high) of testing var first in f from the task results, None when a task is
+            missing or every task of a branch was skipped
+        """
+        if self.split_depth == 1:
+            result = results.get(((), var))
+            if result is None or result[1] is None:
+                return None
+            return result[0], ddt_intern(result[1]), ddt_intern(result[2])
+
+        branch_results = []
+        for value in (0, 1):
+            g = self.bdd.cofactor(f, var, value)
+            if g < 2:
+                branch_results.append(self.memo[g])
+                continue
+            best_value = inf
+            best = None
+            for second in branches[(var, value)]:
+                result = results.get((((var, value),), second))
+                if result is None:
+                    return None
+                if result[1] is not None and result[0] < best_value:
+                    best_value = result[0]
+                    best = ddt_node(second, ddt_intern(result[1]), ddt_intern(result[2]),
+                                    prob=self.probabilities[second], cost=self.cost[second])
+            if best is None:
+                return None
+            branch_results.append((best_value, best))
+
+        p = self.probabilities[var]
+        (value0, ddt0), (value1, ddt1) = branch_results
+        return self.step(var) + (1 - p) * value0 + p * value1, ddt0, ddt1
+
+    def _store(self, f, value, best):
+        ddt = None
+        if best is not None:
+            var, low_ddt, high_ddt = best
+            ddt = ddt_node(var, low_ddt, high_ddt, prob=self.probabilities[var], cost=self.cost[var])
+        self.memo[f] = (value, ddt)
+        return self.memo[f]
+
+    def _lower_bound(self, f):
+        """
+        :return: lower bound on the expected cost (height) of any DDT for the BDD node f
+        """
+        if f in self.memo:
+            return self.memo[f][0]
+        if f not in self.bounds:
+            self._compute_bounds(f)
+        return max(self.bounds[f][3], self.lower.get(f, 0))
+
+    def _compute_bounds(self, f):
+        """
+        Fills self.bounds with (probability, cheapest cut set, cheapest path set, lower bound) for f and its
+        descendants. The cheapest cut set is the cheapest way to reach the 1 terminal paying for the variables set
+        to 1, the cheapest path set is the cheapest way to reach 0 paying for the variables set to 0.
+        """
+        bdd = self.bdd
+        inf = float('inf')
+        bounds = self.bounds
+        bounds.setdefault(0, (0.0, inf, 0, 0))
+        bounds.setdefault(1, (1.0, 0, inf, 0))
+
+        def unknown_children(node):
+            return [child for child in bdd._children(node) if child not in bounds]
+
+        for node in postorder(f, children=unknown_children, unique=True, key=int):
+            var = bdd.order[bdd.level[node]]
+            p = self.probabilities[var]
+            step = self.step(var)
+            low = bounds[bdd.low[node]]
+            high = bounds[bdd.high[node]]
+            prob = (1 - p) * low[0] + p * high[0]
+            cut = min(low[1], step + high[1])
+            path = min(step + low[2], high[2])
+            bound = (prob * cut if prob > 0 else 0) + ((1 - prob) * path if prob < 1 else 0)
+            bounds[node] = (prob, cut, path, bound)
+
+    def _heuristic(self):
+        """
+        :return: DDT of the bottom-up heuristic for the objective, None if it tests variables that may not be tested
+        """
+        from Algorithms.Cost.BUDAcost import BUDAcost
+        from Algorithms.Height.BUDA import BUDA
+
+        if self.objective == COST:
+            ddt = BUDAcost(self.ft)
+        else:
+            ddt = BUDA(self.ft).remove_duplicate_vertices()
+        names = {var for var, _ in self.candidates}
+        for node in postorder(ddt, unique=True):
+            if node.type == DdtElementType.DEC and node.name not in names:
+                return None
+        return ddt
+
+    def _value(self, ddt):
+        """
+        :return: expected cost (height) of ddt with the probabilities and costs of this solver
+        """
+        values = {}
+        for node in postorder(ddt, unique=True):
+            if node.type == DdtElementType.DEC:
+                p = self.probabilities[node.name]
+                low, high = node.children
+                values[id(node)] = self.step(node.name) + (1 - p) * values[id(low)] + p * values[id(high)]
+            else:
+                values[id(node)] = 0
+        return values[id(ddt)]
+
+
+# solver, BDD node of the fault tree and shared best value of a worker process of ExactSolver._solve_parallel
+_worker_solver = None
+_worker_root = None
+_worker_best = None
+
+
+def _init_worker(ft, variables, probabilities, cost, objective, branch_and_bound, shared_best):
+    global _worker_solver, _worker_root, _worker_best
+    _worker_solver = ExactSolver(ft, variables, probabilities, cost, objective=objective,
+                                 branch_and_bound=branch_and_bound)
+    _worker_root = _worker_solver.bdd.build(ft)
+    _worker_best = shared_best
+
+
+def _run_task(assignments, var):
+    """
+    :param assignments: ((variable, value), ...) tests above var
+    :param var: candidate tested first in the function left by the assignments
+    :return: (task, (value, DDT low, DDT high), expanded, pruned), the DDTs are None when the candidate was skipped
+    """
+    solver = _worker_solver
+    expanded, pruned = solver.expanded, solver.pruned
+    f = _worker_root
+    budget = inf
+    if solver.branch_and_bound:
+        # equal values are kept, so ties are broken in candidate order when the results are merged
+        budget = nextafter(_worker_best.value, inf)
+        for name, value in assignments:
+            budget = solver._branch_budget(f, name, value, budget)
+            f = solver.bdd.cofactor(f, name, value)
+    else:
+        for name, value in assignments:
+            f = solver.bdd.cofactor(f, name, value)
+    result = solver._candidate(f, var, budget)
+    return (assignments, var), result, solver.expanded - expanded, solver.pruned - pruned
@@ -1,67 +1,76 @@
 from FaultTree.FaultTree import *
 from DDT.DDT import *
+from Algorithms.CutSets import as_family, best_row, log_weight
+from Algorithms.Memo import MEMO_SIZE
 
-def CuDAprob(ft, cutsets):
+def CuDAprob(ft, cutsets, memo_size=MEMO_SIZE):
     """
     This is an algorithm that transforms fault trees into diagnostic decision trees using cut sets
-    :param ft: fault tree that will be converted
-    :param cutsets: a set of all minimal cut sets
+    :param ft: fault tree that will be converted (FT or CompiledFT)
+    :param cutsets: a set of all minimal cut sets (list of lists of names or SetFamily)
+    :param memo_size: number of residual cut-set families whose DDT is remembered, None for no limit, 0 for none
     :return: a diagnostic decision tree corresponding to ft
     """
-    if not cutsets:
-        return DDT('ZERO', DdtElementType.ZERO)
-    if [] in cutsets:
-        return DDT('ONE', DdtElementType.ONE)
+    ft = ft.compile()
+    cutsets = as_family(cutsets)
+    if not len(cutsets):
+        return ddt_leaf(DdtElementType.ZERO)
+    if cutsets.has_empty_set():
+        return ddt_leaf(DdtElementType.ONE)
     else:
-        current_cs = find_likely_cut_set(ft, cutsets)
-        var = find_min_var(ft, current_cs)
-        ftvar = ft.find_vertex_by_name(var)
-        return DDT(var, ddtelement=DdtElementType.DEC, children=[CuDAprob(ft, remove_cs(cutsets, var)), CuDAprob(ft, remove_var(cutsets, var))], prob=ftvar.prob, cost=ftvar.cost)
+        # the same residual family is reached by testing variables in different orders
+        memo = cutsets.memo(("CuDAprob", ft), memo_size)
+        key = cutsets.key()
+        ddt = memo.get(key)
+        if ddt is None:
+            current_cs = find_likely_cut_set(ft, cutsets)
+            var = find_min_var(ft, current_cs)
+            ddt = ddt_node(var, CuDAprob(ft, remove_cs(cutsets, var), memo_size),
+                           CuDAprob(ft, remove_var(cutsets, var), memo_size),
+                           prob=ft.prob_of(var), cost=ft.cost_of(var))
+            memo.put(key, ddt)
+        return ddt
 
 
 def CuDAsize(ft, cutsets):
     """
     This is an algorithm that transforms fault trees into diagnostic decision trees using cut sets
-    :param ft: fault tree that will be converted
-    :param cutsets: a set of all minimal cut sets
+    :param ft: fault tree that will be converted (FT or CompiledFT)
+    :param cutsets: a set of all minimal cut sets (list of lists of names or SetFamily)
     :return: a diagnostic decision tree corresponding to ft
     """
-    if not cutsets:
-        return DDT('ZERO', DdtElementType.ZERO)
-    if [] in cutsets:
-        return DDT('ONE', DdtElementType.ONE)
+    ft = ft.compile()
+    cutsets = as_family(cutsets)
+    if not len(cutsets):
+        return ddt_leaf(DdtElementType.ZERO)
+    if cutsets.has_empty_set():
+        return ddt_leaf(DdtElementType.ONE)
     else:
-        current_cs = sorted(cutsets, key=len)[0]
+        # first of the smallest sets, as a stable sort on the size would pick
+        current_cs = cutsets.members(int(cutsets.sizes().argmin()))
         var = find_min_var(ft, current_cs)
-        ftvar = ft.find_vertex_by_name(var)
-        return DDT(var, ddtelement=DdtElementType.DEC,
-                   children=[CuDAprob(ft, remove_cs(cutsets, var)), CuDAprob(ft, remove_var(cutsets, var))],
-                   prob=ftvar.prob, cost=ftvar.cost)
+        return ddt_node(var, CuDAprob(ft, remove_cs(cutsets, var)), CuDAprob(ft, remove_var(cutsets, var)),
+                        prob=ft.prob_of(var), cost=ft.cost_of(var))
 
 
 def remove_var(cutsets, remove):
     """
     This function removes all variables equal to remove argument in the set of all cut sets
-    :param cutsets: set of cut sets
+    :param cutsets: SetFamily of cut sets
     :param remove: basic event that needs to be removed
-    :return: set of cut sets where all basic events equal to remove are removed
+    :return: SetFamily of cut sets where all basic events equal to remove are removed
     """
-    updated_cutsets = [
-        [e for e in cutset if e != remove]
-        for cutset in cutsets
-    ]
-    return updated_cutsets
+    return cutsets.without_variable(remove)
 
 
 def remove_cs(cutsets, event):
     """
     This function removes all cut sets that contain the given event
-    :param cutsets: set of cut sets
+    :param cutsets: SetFamily of cut sets
     :param event: event for which cut sets need to be removed
-    :return: set of cut sets that do not contain event
+    :return: SetFamily of cut sets that do not contain event
     """
-    updated_cutsets = [cutset for cutset in cutsets if event not in cutset]
-    return updated_cutsets
+    return cutsets.without_sets_containing(event)
 
 
 def find_min_var(ft, current_cs):
@@ -71,13 +80,14 @@ def find_min_var(ft, current_cs):
     :param current_cs: the cut set that is currently being used
     :return: variable with the highest failure probability
     """
+    ft = ft.compile()
     prob = float('inf')
     min_var = None
     for var in current_cs:
-        current = ft.find_vertex_by_name(var)
-        if current.prob < prob:
-            prob = current.prob
-            min_var = current.name
+        p = ft.prob_of(var)
+        if p < prob:
+            prob = p
+            min_var = var
     return min_var
 
 
@@ -85,19 +95,10 @@ def find_likely_cut_set(ft, cutsets):
     """
     Function that calculates probability of all cut sets and returns the one with the highest probability
     :param ft: fault tree
-    :param cutsets: set of cut sets
+    :param cutsets: SetFamily of cut sets
     :return: cut set in S with the highest probability
     """
-    maxP = 0
-    cutset = None
-    for cs in cutsets:
-        P = 1
-        for vertex in cs:
-            current = ft.find_vertex_by_name(vertex)
-            P *= current.prob
-        if P > maxP:
-            maxP = P
-            cutset = cs
-    return cutset
-
-
+    ft = ft.compile()
+    log_prob = cutsets.row_sums(("log_prob", ft), lambda var: log_weight(ft.prob_of(var)))
+    row = best_row(log_prob, maximize=True)
+    return None if row is None else cutsets.members(row)
@@ -1,86 +1,26 @@
 from FaultTree.FaultTree import *
 from DDT.DDT import *
+from Algorithms.Exact import ExactSolver, HEIGHT
 
 
-def EDA(ft, variables, probabilities, cost):
-    if ft_false(ft):
-        return DDT('ZERO', DdtElementType.ZERO)
-    if ft_true(ft):
-        return DDT('ONE', DdtElementType.ONE)
-
-    optimal_height = float('inf')
-    optimal_ddt = None
-
-    for var in variables:
-        remaining_var = variables - {var}
-        left_ft = restrict(ft, var, 0)
-        right_ft = restrict(ft, var, 1)
-
-        left_ddt = EDA(left_ft, remaining_var, probabilities, cost)
-        right_ddt = EDA(right_ft, remaining_var, probabilities, cost)
-
-        expected_height = 1 + (1-probabilities[var])*left_ddt.expected_height() + probabilities[var]*right_ddt.expected_height()
-
-        if expected_height < optimal_height:
-            optimal_height = expected_height
-            optimal_ddt = DDT(name=var, ddtelement=DdtElementType.DEC, children=[left_ddt, right_ddt], prob=probabilities[var], cost=cost[var])
-    return optimal_ddt
-
-
-def restrict(ft, var, value):
-    if ft.type == FtElementType.BE:
-        if ft.name == var:
-            return FT(ft.name, FtElementType.BE, prob=value)
-        else:
-            return ft
-
-    new_children = [restrict(child, var, value) for child in ft.children]
-
-    if all(child.type == FtElementType.BE and child.probabilities in [0, 1] for child in new_children):
-        if ft.type == FtElementType.AND:
-            if any(child.prob == '0' for child in new_children):
-                return FT('ZERO', FtElementType.BE, prob=0)
-            else:
-                return FT('ONE', FtElementType.BE, prob=1)
-        elif ft.type == FtElementType.OR:
-            if any(child.prob == 1 for child in new_children):
-                return FT('ONE', FtElementType.BE, prob=1)
-            else:
-                return FT('ZERO', FtElementType.BE, prob=0)
-
-    return FT(ft.name, ft.type, new_children)
-
-def ft_false(ft):
-    """
-    function that checks if all elements evaluate to non-failure
-    :param ft: fault tree
-    :return:
-    True if fault tree evaluates to 0
-    False if fault tree does not evaluate to 0
-    """
-    if ft.type == FtElementType.BE:
-        return ft.prob == 0
-    if ft.type == FtElementType.AND:
-        return any(ft_false(child) for child in ft.children)
-    if ft.type == FtElementType.OR:
-        return all(ft_false(child) for child in ft.children)
-
-def ft_true(ft):
+def EDA(ft, variables, probabilities, cost, branch_and_bound=False, stats=None, workers=None, split_depth=1):
     """
-    function that checks if all elements evaluate to failure
+    Exact algorithm: computes a diagnostic decision tree with the minimal expected height
     :param ft: fault tree
-    :return:
-    True if fault tree evaluates to 1
-    False if fault tree does not evaluate to 1
+    :param variables: variables that may be tested
+    :param probabilities: dict variable -> failure probability
+    :param cost: dict variable -> cost of testing the variable
+    :param branch_and_bound: prune with lower bounds, starting from the BUDA DDT as upper bound
+    :param stats: optional dict that receives the number of subproblems expanded and pruned
+    :param workers: number of processes that solve the choices of the first tests in parallel, None for sequential
+    :param split_depth: 1 to split the choice of the first test into tasks, 2 to split the first two
+    :return: optimal diagnostic decision tree
     """
-    if ft.type == FtElementType.BE:
-        return ft.prob == 1
-    if ft.type == FtElementType.AND:
-        return all(ft_true(child) for child in ft.children)
-    if ft.type == FtElementType.OR:
-        return any(ft_true(child) for child in ft.children)
-
-
-
-
-
+    solver = ExactSolver(ft, variables, probabilities, cost, objective=HEIGHT, branch_and_bound=branch_and_bound,
+                         workers=workers, split_depth=split_depth)
+    ddt = solver.solve()
+    if stats is not None:
+        stats["expanded"] = solver.expanded
+        stats["pruned"] = solver.pruned
+        stats["upper_bound"] = solver.upper_bound
+    return ddt
@@ -1,55 +1,62 @@
 from DDT.DDT import *
+from Algorithms.CutSets import as_family, best_row, log_weight
+from Algorithms.Memo import MEMO_SIZE
 
 
-def PaDAprob(ft, pathsets):
-    if not pathsets:
-        return DDT('ONE', DdtElementType.ONE)
-    if [] in pathsets:
-        return DDT('ZERO', DdtElementType.ZERO)
+def PaDAprob(ft, pathsets, memo_size=MEMO_SIZE):
+    ft = ft.compile()
+    pathsets = as_family(pathsets)
+    if not len(pathsets):
+        return ddt_leaf(DdtElementType.ONE)
+    if pathsets.has_empty_set():
+        return ddt_leaf(DdtElementType.ZERO)
     else:
-        current_ps = find_max_path_set(ft, pathsets)
-        var = find_max_var(ft, current_ps)
-        ftvar = ft.find_vertex_by_name(var)
-        return DDT(var, ddtelement=DdtElementType.DEC,
-                   children=[PaDAprob(ft, remove_var(pathsets, var)), PaDAprob(ft, remove_ps(pathsets, var))],
-                   prob=ftvar.prob, cost=ftvar.cost)
+        # the same residual family is reached by testing variables in different orders
+        memo = pathsets.memo(("PaDAprob", ft), memo_size)
+        key = pathsets.key()
+        ddt = memo.get(key)
+        if ddt is None:
+            current_ps = find_max_path_set(ft, pathsets)
+            var = find_max_var(ft, current_ps)
+            ddt = ddt_node(var, PaDAprob(ft, remove_var(pathsets, var), memo_size),
+                           PaDAprob(ft, remove_ps(pathsets, var), memo_size),
+                           prob=ft.prob_of(var), cost=ft.cost_of(var))
+            memo.put(key, ddt)
+        return ddt
 
 
 def PaDAsize(ft, pathsets):
-    if not pathsets:
-        return DDT('ONE', DdtElementType.ONE)
-    if [] in pathsets:
-        return DDT('ZERO', DdtElementType.ZERO)
+    ft = ft.compile()
+    pathsets = as_family(pathsets)
+    if not len(pathsets):
+        return ddt_leaf(DdtElementType.ONE)
+    if pathsets.has_empty_set():
+        return ddt_leaf(DdtElementType.ZERO)
     else:
-        current_ps = sorted(pathsets, key=len)[0]
+        # first of the smallest sets, as a stable sort on the size would pick
+        current_ps = pathsets.members(int(pathsets.sizes().argmin()))
         var = find_max_var(ft, current_ps)
-        ftvar = ft.find_vertex_by_name(var)
-        return DDT(var, ddtelement=DdtElementType.DEC,
-                   children=[PaDAsize(ft, remove_ps(pathsets, var)), PaDAsize(ft, remove_var(pathsets, var))],
-                   prob=ftvar.prob, cost=ftvar.cost)
+        return ddt_node(var, PaDAsize(ft, remove_ps(pathsets, var)), PaDAsize(ft, remove_var(pathsets, var)),
+                        prob=ft.prob_of(var), cost=ft.cost_of(var))
 
 
 def remove_var(pathsets, remove):
-    updated_pathsets = [
-        [e for e in pathset if e != remove]
-        for pathset in pathsets
-    ]
-    return updated_pathsets
+    return pathsets.without_variable(remove)
 
 
 def remove_ps(pathsets, event):
-    updated_pathsets = [pathset for pathset in pathsets if event not in pathset]
-    return updated_pathsets
+    return pathsets.without_sets_containing(event)
 
 
 def find_max_var(ft, current_ps):
+    ft = ft.compile()
     prob = 0
     max_var = None
     for var in current_ps:
-        current = ft.find_vertex_by_name(var)
-        if current.prob > prob:
-            prob = current.prob
-            max_var = current.name
+        p = ft.prob_of(var)
+        if p > prob:
+            prob = p
+            max_var = var
     return max_var
 
 
@@ -57,17 +64,10 @@ def find_max_path_set(ft, pathsets):
     """
     Function that calculates probability of all path sets and returns the one with the lowest probability
     :param ft: fault tree
-    :param S: set of cut sets
+    :param pathsets: SetFamily of path sets
     :return: path set in S with the lowest probability
     """
-    maxP = 0
-    pathset = None
-    for ps in pathsets:
-        P = 1
-        for vertex in ps:
-            current = ft.find_vertex_by_name(vertex)
-            P *= (1-current.prob)
-        if P > maxP:
-            maxP = P
-            pathset = ps
-    return pathset
\ No newline at end of file
+    ft = ft.compile()
+    log_prob = pathsets.row_sums(("log_prob_working", ft), lambda var: log_weight(1 - ft.prob_of(var)))
+    row = best_row(log_prob, maximize=True)
+    return None if row is None else pathsets.members(row)
@@ -0,0 +1,42 @@
+from collections import OrderedDict
+
+
+# default number of subproblems remembered by the memoized algorithms
+MEMO_SIZE = 100000
+
+
+class LRUCache:
+    """
+    Dictionary with a maximum number of entries, adding an entry to a full cache evicts the least recently used one
+    """
+    def __init__(self, maxsize=MEMO_SIZE):
+        """
+        :param maxsize: maximum number of entries, None for no limit and 0 to disable the cache
+        """
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        :return: value stored for key, None if it is not in the cache
+        """
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.maxsize == 0:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if self.maxsize is not None and len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
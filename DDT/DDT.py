@@ -1,4 +1,6 @@
 from enum import Enum
+from weakref import WeakValueDictionary
+from FaultTree.Traversal import preorder, preorder_with_depth, postorder
 
 
 class DdtElementType(Enum):
@@ -7,86 +9,165 @@ class DdtElementType(Enum):
     ZERO = 3
 
 
+# element type of every type code, nodes store the code (DdtElementType.value) of their type
+_DDT_TYPES = (None, DdtElementType.DEC, DdtElementType.ONE, DdtElementType.ZERO)
+
+
+# positions in the tuple of aggregates cached on every node
+FAIL_PROB, EXPECTED_COST, EXPECTED_COST_FAILURE, EXPECTED_HEIGHT, SIZE = range(5)
+
+
 class DDT:
-    def __init__(self, name, ddtelement, children=None, prob=None, cost=None):
-        if children is None:
-            children = []
-        self.name = name
-        self.type = ddtelement
-        self.children = children
-        self.prob = prob
-        self.cost = cost
+    # Nodes have a fixed set of slots instead of an attribute dict, the weak reference slot is used by the
+    # unique table of the node factory. Children are a tuple: (low, high) for decision nodes, empty for leaves.
+    # The type is stored as its small-int code, the type property gives the DdtElementType.
+    __slots__ = ("name", "_type", "children", "prob", "cost", "_aggregates", "__weakref__")
+
+    # Cached aggregates are only valid for the generation they were computed in,
+    # assigning an attribute of any DDT node starts a new generation.
+    _generation = 0
+
+    def __init__(self, name, ddtelement, children=(), prob=None, cost=None):
+        set_attr = object.__setattr__
+        set_attr(self, "name", name)
+        set_attr(self, "_type", ddtelement.value)
+        set_attr(self, "children", tuple(children))
+        set_attr(self, "prob", prob)
+        set_attr(self, "cost", cost)
+        set_attr(self, "_aggregates", None)
+
+    def __setattr__(self, key, value):
+        if key == "children":
+            value = tuple(value)
+        object.__setattr__(self, key, value)
+        DDT.invalidate()
+
+    @property
+    def type(self):
+        return _DDT_TYPES[self._type]
+
+    @type.setter
+    def type(self, ddtelement):
+        object.__setattr__(self, "_type", ddtelement.value)
+
+    def __getstate__(self):
+        return {key: getattr(self, key) for key in ("name", "_type", "children", "prob", "cost")}
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            object.__setattr__(self, key, value)
+        object.__setattr__(self, "_aggregates", None)
+
+    @staticmethod
+    def invalidate():
+        """
+        Discards all cached aggregates, needed only when nodes are changed in a way DDT cannot observe
+        """
+        DDT._generation += 1
+
+    def aggregates(self):
+        """
+        Fail probability, expected cost, expected cost restricted to failure leaves, expected height and size
+        (number of nodes when unfolded to a tree) of this DDT. They are computed in one bottom-up pass and cached
+        on every node of the DDT, so asking again for this node or any of its descendants is O(1).
+        :return: tuple indexed by FAIL_PROB, EXPECTED_COST, EXPECTED_COST_FAILURE, EXPECTED_HEIGHT and SIZE, the
+            two cost aggregates are None when a test of the DDT has no cost
+        """
+        generation = DDT._generation
+        if self._aggregates is not None and self._aggregates[0] == generation:
+            return self._aggregates[1]
+
+        def outdated_children(node):
+            return [child for child in node.children
+                    if child._aggregates is None or child._aggregates[0] != generation]
+
+        for node in postorder(self, children=outdated_children, unique=True):
+            if node.type == DdtElementType.DEC:
+                low = node.children[0]._aggregates[1]
+                high = node.children[1]._aggregates[1]
+                p = node.prob
+                cost = node.cost
+                fail_prob = (1 - p) * low[FAIL_PROB] + p * high[FAIL_PROB]
+                # height-only DDTs have tests without cost, their cost aggregates are None and asking for them
+                # raises, the other aggregates are still computed
+                if cost is None or low[EXPECTED_COST] is None or high[EXPECTED_COST] is None:
+                    expected_cost = expected_cost_failure = None
+                else:
+                    expected_cost = cost + (1 - p) * low[EXPECTED_COST] + p * high[EXPECTED_COST]
+                    # the cost of this test is paid on every path that ends in a failure leaf below it
+                    expected_cost_failure = (cost * fail_prob + (1 - p) * low[EXPECTED_COST_FAILURE]
+                                             + p * high[EXPECTED_COST_FAILURE])
+                values = (
+                    fail_prob,
+                    expected_cost,
+                    expected_cost_failure,
+                    (1 - p) * (low[EXPECTED_HEIGHT] + 1) + p * (high[EXPECTED_HEIGHT] + 1),
+                    1 + low[SIZE] + high[SIZE],
+                )
+            else:
+                values = (1 if node.type == DdtElementType.ONE else 0, 0, 0, 0, 1)
+            object.__setattr__(node, "_aggregates", (generation, values))
+        return self._aggregates[1]
 
     def fail_prob(self, ddt=None):
         if ddt is None:
             ddt = self
-        if ddt.type == DdtElementType.ZERO:
-            return 0
-        if ddt.type == DdtElementType.ONE:
-            return 1
-        left = (1 - ddt.prob) * self.fail_prob(ddt.children[0])
-        right = ddt.prob * self.fail_prob(ddt.children[1])
-        return left + right
+        return ddt.aggregates()[FAIL_PROB]
 
     def expected_height(self, ddt=None, depth=0):
         if ddt is None:
             ddt = self
-        if ddt.type is not DdtElementType.DEC:
-            return depth
-        left = (1 - ddt.prob) * self.expected_height(ddt.children[0], depth + 1)
-        right = ddt.prob * self.expected_height(ddt.children[1], depth + 1)
-        return left + right
+        return depth + ddt.aggregates()[EXPECTED_HEIGHT]
 
     def expected_cost(self, ddt=None):
         if ddt is None:
             ddt = self
-        if ddt.type != DdtElementType.DEC:
-            return 0  # leaf cost
-        left = (1 - ddt.prob) * self.expected_cost(ddt.children[0])
-        right = ddt.prob * self.expected_cost(ddt.children[1])
-        return ddt.cost + left + right
+        return ddt._cost_aggregate(EXPECTED_COST)
+
+    def size(self):
+        return self.aggregates()[SIZE]
 
     def find_vertex_by_name(self, name, ddt=None):
         if ddt is None:
             ddt = self
-        if ddt.name == name:
-            return ddt
-        for child in ddt.children:
-            result = self.find_vertex_by_name(name, child)
-            if result is not None:
-                return result
+        for node in preorder(ddt):
+            if node.name == name:
+                return node
         return None
 
     def expected_cost_failure(self):
-        expcost = 0
-        failure_paths = [sublist for sublist in self.all_paths() if not sublist[-1].endswith('ZERO')]
-        for path in failure_paths:
-            cost = 0
-            prob = 1
-            for elem in path[:-1]:
-                node = self.find_vertex_by_name(elem[0])
-                cost += node.cost
-                if elem[1] == 0:
-                    prob *= (1 - node.prob)
-                elif elem[1] == 1:
-                    prob *= node.prob
-            expcost += prob * cost
-        return expcost
+        """
+        :return: sum over all paths ending in a ONE leaf of path probability times the cost of the tests on it
+        """
+        return self._cost_aggregate(EXPECTED_COST_FAILURE)
+
+    def _cost_aggregate(self, index):
+        value = self.aggregates()[index]
+        if value is None:
+            raise ValueError(f"DDT {self.name} has a test without cost")
+        return value
+
+    def expected_cost_given_failure(self):
+        """
+        :return: expected cost of diagnosing given that the system failed, 0 if the system cannot fail
+        """
+        return self.expected_cost_failure() / (self.fail_prob() or 1)
 
     def all_paths(self, path=None):
         if path is None:
             path = []
 
-        if self.type == DdtElementType.DEC:
-            paths = []
-            left_paths = self.children[0].all_paths(path + [(self.name, 0)])
-            right_paths = self.children[1].all_paths(path + [(self.name, 1)])
-            paths.extend(left_paths)
-            paths.extend(right_paths)
-            return paths
-        else:
-            # Leaf node: return path + result
-            return [path + [f"{self.type.name}"]]
+        paths = []
+        stack = [(self, path)]
+        while stack:
+            node, node_path = stack.pop()
+            if node.type == DdtElementType.DEC:
+                stack.append((node.children[1], node_path + [(node.name, 1)]))
+                stack.append((node.children[0], node_path + [(node.name, 0)]))
+            else:
+                # Leaf node: return path + result
+                paths.append(node_path + [f"{node.type.name}"])
+        return paths
 
     def check_duplicates(self, ddt=None):
         if ddt is None:
@@ -101,54 +182,192 @@ class DDT:
         return duplicates
 
     def remove_duplicate_vertices(self, ddt=None, seen=None):
-        if seen is None:
-            seen = set()
+        """
+        Removes tests of variables that were already tested on the path from the root.
+        Works on DAG-shaped DDTs: a shared node is rewritten once for every distinct set of earlier test outcomes
+        that are relevant for it, and nodes that do not change are reused instead of copied.
+        :param ddt: diagnostic decision tree, self if not given
+        :param seen: (name, outcome) pairs of tests that were already performed
+        :return: diagnostic decision tree without duplicate tests
+        """
         if ddt is None:
             ddt = self
-        for tup in seen:
-            if tup[0] == ddt.name:
-                if tup[1] == 0:
-                    return ddt.children[0].remove_duplicate_vertices(seen=seen)
-                if tup[1] == 1:
-                    return ddt.children[1].remove_duplicate_vertices(seen=seen)
-        if ddt.type != DdtElementType.DEC:
-            return ddt
-        child1 = self.remove_duplicate_vertices(ddt.children[0], seen=seen.union({(ddt.name, 0)}))
-        child2 = self.remove_duplicate_vertices(ddt.children[1], seen=seen.union({(ddt.name, 1)}))
-        return DDT(ddt.name, DdtElementType.DEC, children=[child1, child2], cost=ddt.cost, prob=ddt.prob)
+
+        # variables are bits, below[id(node)] holds the variables tested in node or any of its descendants,
+        # duplicates holds the nodes with a variable that is tested twice on some path inside their subtree
+        bit = {}
+        below = {}
+        duplicates = set()
+        for node in postorder(ddt, unique=True):
+            mask = 0
+            if node.type == DdtElementType.DEC:
+                low, high = node.children
+                children_mask = below[id(low)] | below[id(high)]
+                b = bit.setdefault(node.name, 1 << len(bit))
+                mask = b | children_mask
+                if b & children_mask or id(low) in duplicates or id(high) in duplicates:
+                    duplicates.add(id(node))
+            below[id(node)] = mask
+
+        tested = outcome = 0
+        for name, value in (seen or ()):
+            b = bit.setdefault(name, 1 << len(bit))
+            tested |= b
+            if value == 1:
+                outcome |= b
+
+        rewritten = {}
+        results = []
+        stack = [(ddt, tested, outcome, None)]
+        while stack:
+            node, tested, outcome, key = stack.pop()
+            if key is not None:
+                child2 = results.pop()
+                child1 = results.pop()
+                if child1 is node.children[0] and child2 is node.children[1]:
+                    result = node
+                else:
+                    result = ddt_node(node.name, child1, child2, prob=node.prob, cost=node.cost)
+                rewritten[key] = result
+                results.append(result)
+                continue
+            while node.type == DdtElementType.DEC and tested & bit[node.name]:
+                node = node.children[1 if outcome & bit[node.name] else 0]
+            relevant = below[id(node)]
+            if not tested & relevant and id(node) not in duplicates:
+                results.append(node)
+                continue
+            key = (id(node), tested & relevant, outcome & relevant)
+            if key in rewritten:
+                results.append(rewritten[key])
+                continue
+            b = bit[node.name]
+            stack.append((node, tested, outcome, key))
+            stack.append((node.children[1], tested | b, outcome | b, None))
+            stack.append((node.children[0], tested | b, outcome, None))
+        return results[0]
 
     def print(self):
         print(self.to_string())
 
     def to_string(self, level=0):
-        indent = "  " * level
-        if self.cost is not None:
-            result = f"{indent}- {self.name} (type: {self.type}, prob: {self.prob}, cost: {self.cost})\n"
-        elif self.prob is not None:
-            result = f"{indent}- {self.name} (type: {self.type}, prob: {self.prob})\n"
-        else:
-            result = f"{indent}- {self.name} (type: {self.type})\n"
-        for child in self.children:
-            result += child.to_string(level + 1)
-        return result
+        lines = []
+        for node, depth in preorder_with_depth(self):
+            indent = "  " * (level + depth)
+            if node.cost is not None:
+                lines.append(f"{indent}- {node.name} (type: {node.type}, prob: {node.prob}, cost: {node.cost})\n")
+            elif node.prob is not None:
+                lines.append(f"{indent}- {node.name} (type: {node.type}, prob: {node.prob})\n")
+            else:
+                lines.append(f"{indent}- {node.name} (type: {node.type})\n")
+        return "".join(lines)
 
 
 def ddt_from_tuple(ddt, prob=None, cost=None):
     if isinstance(ddt, tuple):
         if cost is not None:
-            p = prob[ddt[0]]
-            c = cost[ddt[0]]
-            return DDT(ddt[0], DdtElementType.DEC,
-                       children=[ddt_from_tuple(ddt[1], prob, cost), ddt_from_tuple(ddt[2], prob, cost)], prob=p,
-                       cost=c)
+            return ddt_node(ddt[0], ddt_from_tuple(ddt[1], prob, cost), ddt_from_tuple(ddt[2], prob, cost),
+                            prob=prob[ddt[0]], cost=cost[ddt[0]])
         elif prob is not None:
-            p = prob[ddt[0]]
-            return DDT(ddt[0], DdtElementType.DEC,
-                       children=[ddt_from_tuple(ddt[1], prob), ddt_from_tuple(ddt[2], prob)], prob=p)
-        return DDT(ddt[0], DdtElementType.DEC, children=[ddt_from_tuple(ddt[1], prob), ddt_from_tuple(ddt[2], prob)])
+            return ddt_node(ddt[0], ddt_from_tuple(ddt[1], prob), ddt_from_tuple(ddt[2], prob), prob=prob[ddt[0]])
+        return ddt_node(ddt[0], ddt_from_tuple(ddt[1], prob), ddt_from_tuple(ddt[2], prob))
     elif ddt == '0':
-        return DDT('ZERO', DdtElementType.ZERO)
+        return ddt_leaf(DdtElementType.ZERO)
     elif ddt == '1':
-        return DDT('ONE', DdtElementType.ONE)
+        return ddt_leaf(DdtElementType.ONE)
+
+
+# Unique tables of the node factory. Decision nodes are keyed on their test and the identities of their children,
+# an entry disappears together with the last reference to its node. Leaves live as long as the module.
+_unique_nodes = WeakValueDictionary()
+_leaves = {}
+
+
+def ddt_leaf(ddtelement):
+    """
+    :param ddtelement: DdtElementType.ZERO or DdtElementType.ONE
+    :return: the shared leaf of that type
+    """
+    leaf = _leaves.get(ddtelement)
+    if leaf is None:
+        leaf = DDT(ddtelement.name, ddtelement)
+        _leaves[ddtelement] = leaf
+    return leaf
+
+
+def ddt_node(name, low, high, prob=None, cost=None):
+    """
+    Hash-consed decision node: asking twice for the same test on the same children returns the same object.
+    Since children are hash-consed as well, two DDTs built with the factory are structurally equal exactly when
+    they are the same object, so equality is an O(1) identity check and equal subtrees are stored once.
+    Nodes made by the factory are shared and must not be modified in place.
+    :param name: tested variable
+    :param low: DDT when the variable did not fail
+    :param high: DDT when the variable failed
+    :param prob: failure probability of the variable
+    :param cost: cost of testing the variable
+    :return: decision node
+    """
+    # the children are referenced by the node, so their ids cannot be reused while the entry exists
+    key = (name, prob, cost, id(low), id(high))
+    node = _unique_nodes.get(key)
+    if node is None:
+        node = DDT(name, DdtElementType.DEC, children=(low, high), prob=prob, cost=cost)
+        _unique_nodes[key] = node
+    return node
+
+
+def ddt_intern(ddt):
+    """
+    Rebuilds a DDT that was not made by the factory (e.g. one received from another process) with the factory, so
+    it shares its subtrees with the DDTs of this process.
+    :param ddt: diagnostic decision tree
+    :return: equal diagnostic decision tree made of factory nodes
+    """
+    new = {}
+    for node in postorder(ddt, unique=True):
+        if node.type == DdtElementType.DEC:
+            low, high = node.children
+            new[id(node)] = ddt_node(node.name, new[id(low)], new[id(high)], prob=node.prob, cost=node.cost)
+        else:
+            new[id(node)] = ddt_leaf(node.type)
+    return new[id(ddt)]
+
+
+def replace_leaves(ddt, target_type, replacement):
+    """
+    Replaces every leaf of target_type in ddt by replacement. The replacement is grafted by reference and nodes
+    without a target leaf below them are reused, so only the nodes on paths to target leaves are copied.
+    :param ddt: diagnostic decision tree
+    :param target_type: DdtElementType of the leaves to replace
+    :param replacement: diagnostic decision tree put in place of these leaves
+    :return: diagnostic decision tree (DAG-shaped if ddt has several target leaves)
+    """
+    new = {}
+    for node in postorder(ddt, unique=True):
+        if node.type == target_type:
+            new[id(node)] = replacement
+        elif node.type == DdtElementType.DEC:
+            low, high = new[id(node.children[0])], new[id(node.children[1])]
+            if low is node.children[0] and high is node.children[1]:
+                new[id(node)] = node
+            else:
+                new[id(node)] = ddt_node(node.name, low, high, prob=node.prob, cost=node.cost)
+        else:
+            new[id(node)] = node
+    return new[id(ddt)]
 
 
+def compose(ddts, target_type):
+    """
+    Chains diagnostic decision trees: ddts[i+1] is diagnosed when ddts[i] ends in a leaf of target_type
+    (ONE for the children of an AND gate, ZERO for the children of an OR gate).
+    Folding from the last DDT copies every DDT at most once, so composing k DDTs is linear in their total size.
+    :param ddts: list of diagnostic decision trees in the order they are diagnosed
+    :param target_type: DdtElementType of the leaves that continue with the next DDT
+    :return: composed diagnostic decision tree
+    """
+    result = ddts[-1]
+    for ddt in reversed(ddts[:-1]):
+        result = replace_leaves(ddt, target_type, result)
+    return result
@@ -7,6 +7,10 @@ import datetime
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from Testing.test_algorithms import compare_ft_to_ddt
 from FaultTree.FTParser import *
+from FaultTree.FTCache import FTLoad, cut_set_count, load_folder, prune_cache
+from FaultTree.FaultTree import FT
+from FaultTree.Analysis import FTAnalysis
+from DDT.DDT import DDT
 import re
 
 # Algorithm imports
@@ -21,6 +25,14 @@ from Algorithms.Height.BUDA import BUDA
 from Algorithms.Height.CuDA import CuDAprob
 
 
+# Analyses every algorithm relies on, counted in its runtime when preprocessing is included
+PREPROCESSING = {
+    "CuDA": ("cut_sets",),
+    "CuDAcost": ("cut_sets",),
+    "PaDA": ("path_sets",),
+    "PaDAcost": ("path_sets",),
+}
+
 # Result constants
 OOM_RESULT = "OOM"
 ERROR_RESULT = "ERR"
@@ -36,15 +48,24 @@ def load_config(yaml_file="run_config.yaml"):
 # ----------------------------
 # Compute expected costs
 # ----------------------------
-def expected_costs_from_tree(FaultTree, algorithm, runtime_flag=False):
-    B = FaultTree.variables()
-    P = FaultTree.probabilities()
-    cost = FaultTree.cost_dict()
+def expected_costs_from_tree(FaultTree, algorithm, runtime_flag=False, exact_workers=None, analysis=None,
+                             include_preprocessing=True):
+    # analyses shared by all algorithms run on the same tree
+    if analysis is None:
+        analysis = FTAnalysis(FaultTree)
+    B = analysis.variables()
+    P = analysis.probabilities()
+    cost = analysis.costs()
 
     def _measure(func, runs=1):
         total = 0
         res = None
         for _ in range(runs):
+            # every run starts cold: no cached FT queries (BDD, cofactors, subtree cut sets), no DDT nodes or
+            # aggregates of the previous run. Only the analyses listed in PREPROCESSING are shared.
+            res = None
+            FT.invalidate()
+            DDT.invalidate()
             start = timer()
             res = func()
             total += timer() - start
@@ -52,53 +73,36 @@ def expected_costs_from_tree(FaultTree, algorithm, runtime_flag=False):
 
     def _postprocess(ddt):
         exp_cost = ddt.expected_cost()
-        exp_cost_fail = ddt.expected_cost_failure() / (ddt.fail_prob() or 1)
+        exp_cost_fail = ddt.expected_cost_given_failure()
         compared_to_ft = compare_ft_to_ddt(ddt, FaultTree)
         return exp_cost, exp_cost_fail, compared_to_ft
 
     runs = 25 if runtime_flag else 1
 
     alg_map = {
-        "EDA": lambda: EDA(FaultTree, B, P, cost),
-        "EDAcost": lambda: EDAcost(FaultTree, B, P, cost),
+        "EDA": lambda: EDA(FaultTree, B, P, cost, workers=exact_workers),
+        "EDAcost": lambda: EDAcost(FaultTree, B, P, cost, workers=exact_workers),
         "BUDA": lambda: BUDA(FaultTree).remove_duplicate_vertices(),
         "BUDAcost": lambda: BUDAcost(FaultTree).remove_duplicate_vertices(),
         "BarraCuDA0": lambda: BarraCuDA(FaultTree, 0),
         "BarraCuDA1": lambda: BarraCuDA(FaultTree, 1),
         "BarraCuDA2": lambda: BarraCuDA(FaultTree, 2),
         "BarraCuDA3": lambda: BarraCuDA(FaultTree, 3),
-        "CuDA": lambda: CuDAprob(FaultTree, FaultTree.cut_set()),
-        "CuDAcost": lambda: CuDAcost(FaultTree, FaultTree.cut_set()),
-        "PaDA": lambda: PaDAprob(FaultTree, FaultTree.path_set()),
-        "PaDAcost": lambda: PaDAcost(FaultTree, FaultTree.path_set()),
+        "CuDA": lambda: CuDAprob(FaultTree, analysis.cut_sets()),
+        "CuDAcost": lambda: CuDAcost(FaultTree, analysis.cut_sets()),
+        "PaDA": lambda: PaDAprob(FaultTree, analysis.path_sets()),
+        "PaDAcost": lambda: PaDAcost(FaultTree, analysis.path_sets()),
     }
 
+    # compute the analyses before measuring, their time is added once when preprocessing is included
+    for key in PREPROCESSING.get(algorithm, ()):
+        getattr(analysis, key)()
+
     ddt, rtime = _measure(alg_map[algorithm], runs)
+    if include_preprocessing:
+        rtime += analysis.preprocessing_time(*PREPROCESSING.get(algorithm, ()))
     return *_postprocess(ddt), rtime
 
-# ----------------------------
-# Simple file metrics
-# ----------------------------
-def countbes(filename):
-    count = 0
-    with open(filename, "r") as f:
-        for line in f:
-            line = line.strip().replace('"', '').replace(';', '')
-            tokens = line.split()
-            if len(tokens) > 1 and "prob" in tokens[1]:
-                count += 1
-    return count
-
-def find_num_gates(filename):
-    gates = 0
-    with open(filename, "r") as f:
-        for line in f:
-            line = line.strip().replace('"', '').replace(';', '')
-            tokens = line.split()
-            if len(tokens) > 1 and ("or" in tokens[1] or "and" in tokens[1]):
-                gates += 1
-    return gates
-
 # ----------------------------
 # CSV header
 # ----------------------------
@@ -109,20 +113,28 @@ def write_csv_header(output_folder, algname, addition):
         writer = csv.writer(f)
         writer.writerow(["FT", "expcost", "expcost_given_failure", "bes", "time(s)", "gates", "CS", "TESTIFSAME"])
 
-def _worker(q, file_path, fname, algorithms, addition, rtime_flag):
+def _worker(q, file_path, fname, algorithms, addition, rtime_flag, exact_workers=None, include_preprocessing=True,
+            tree=None, metrics=None, digest=None):
     try:
         results = []
 
-        FaultTree = FTParse(file_path)
-        FaultTree.unreliability(add_unreliability=True)
+        # the file is read once, its metrics and cut set count come from the cache of parsed trees
+        if tree is None:
+            metrics = {}
+            FaultTree = FTLoad(file_path, metrics=metrics)
+        else:
+            FaultTree = tree.to_ft()
+        analysis = FTAnalysis(FaultTree)
+        analysis.unreliability()
 
-        bes = countbes(file_path)
-        gates = find_num_gates(file_path)
-        cs = len(FaultTree.cut_set())
+        bes = metrics["bes"]
+        gates = metrics["gates"]
+        cs = cut_set_count(file_path, ft=FaultTree, digest=digest)
 
         for alg in algorithms:
             expcost, expcost_fail, compared, runtime = expected_costs_from_tree(
-                FaultTree, alg, runtime_flag=rtime_flag
+                FaultTree, alg, runtime_flag=rtime_flag, exact_workers=exact_workers, analysis=analysis,
+                include_preprocessing=include_preprocessing
             )
             results.append(
                 (alg, addition, fname, expcost, expcost_fail, bes, runtime, gates, cs, compared)
@@ -143,11 +155,13 @@ def _worker(q, file_path, fname, algorithms, addition, rtime_flag):
         except Exception:
             pass
 
-def process_file(file_path, fname, algorithms, addition, rt_flag, timeout=1):
+def process_file(file_path, fname, algorithms, addition, rt_flag, timeout=1, exact_workers=None,
+                 include_preprocessing=True, tree=None, metrics=None, digest=None):
     q = mp.Queue()
     p = mp.Process(
         target=_worker,
-        args=(q, file_path, fname, algorithms, addition, rt_flag)
+        args=(q, file_path, fname, algorithms, addition, rt_flag, exact_workers, include_preprocessing, tree,
+              metrics, digest)
     )
 
     print(f"file starting: {file_path} at {datetime.datetime.now()}")
@@ -189,6 +203,27 @@ def process_file(file_path, fname, algorithms, addition, rt_flag, timeout=1):
     print(f"file done: {file_path}")
     return payload
 
+def list_files(folder, with_subfolder):
+    """
+    :param with_subfolder: take the files of the direct subfolders of folder instead of the files of folder
+    :return: paths relative to folder of every file, whatever its extension
+    """
+    paths = []
+    if with_subfolder:
+        for sup in os.listdir(folder):
+            supfolder = os.path.join(folder, sup)
+            if not os.path.isdir(supfolder):
+                continue
+            for fname in os.listdir(supfolder):
+                if os.path.isfile(os.path.join(supfolder, fname)):
+                    paths.append(os.path.join(sup, fname))
+    else:
+        for fname in os.listdir(folder):
+            if os.path.isfile(os.path.join(folder, fname)):
+                paths.append(fname)
+    return paths
+
+
 def run_experiments(config):
     mp.set_start_method("spawn", force=True)
 
@@ -200,41 +235,41 @@ def run_experiments(config):
     runtime_flag = config.get("runtime", True)
     max_workers = config.get("max_workers") or max(1, os.cpu_count() // 2)
     with_subfolder = config.get("with_subfolder", False)
+    # processes per exact algorithm (EDA, EDAcost), null runs them sequentially
+    exact_workers = config.get("exact_workers")
+    # add the time of the cut sets (path sets) to the runtime of the algorithms that use them
+    include_preprocessing = config.get("include_preprocessing", True)
 
     # Prepare CSVs
     for alg in algorithms:
         write_csv_header(output_folder, alg, addition)
 
-    # Build task list
-    tasks = []
-
-    if with_subfolder:
-        for sup in os.listdir(folder):
-            supfolder = os.path.join(folder, sup)
-            if not os.path.isdir(supfolder):
-                continue
-            for fname in os.listdir(supfolder):
-                full_path = os.path.join(supfolder, fname)
-                if os.path.isfile(full_path):
-                    tasks.append((full_path, os.path.join(sup, fname)))
-    else:
-        for fname in os.listdir(folder):
-            full_path = os.path.join(folder, fname)
-            if os.path.isfile(full_path):
-                tasks.append((full_path, fname))
+    # Parse all trees up front, the processes of the pool each parse a chunk of the folder
+    metrics, errors, digests = {}, {}, {}
+    trees, _ = load_folder(folder, compiled=True, workers=max_workers, metrics=metrics, errors=errors,
+                           digests=digests, paths=list_files(folder, with_subfolder))
+    # a file that could not be parsed is parsed again by its worker, which reports the error
+    tasks = [(os.path.join(folder, fname), fname, trees.get(fname), metrics.get(fname), digests.get(fname))
+             for fname in sorted([*trees, *errors])]
 
     # Run
     with ProcessPoolExecutor(max_workers=max_workers) as executor:
         futures = [
             executor.submit(
                 process_file,
-                *task,
+                file_path,
+                fname,
                 algorithms,
                 addition,
                 runtime_flag,
-                timeout_sec
+                timeout_sec,
+                exact_workers,
+                include_preprocessing,
+                tree,
+                file_metrics,
+                digest
             )
-            for task in tasks
+            for file_path, fname, tree, file_metrics, digest in tasks
         ]
 
         for future in as_completed(futures):
@@ -268,3 +303,6 @@ def run_experiments(config):
                         cs,
                         compared
                     ])
+
+    # entries of files that were rewritten since earlier runs are not read again
+    prune_cache()
@@ -1,12 +1,12 @@
 import os
-import glob
 import yaml
 import csv
 import multiprocessing
-import time
 from timeit import default_timer as timer
 
-from FaultTree.FTParser import FTParse
+from FaultTree.FTCache import load_folder, prune_cache
+from FaultTree.FaultTree import FT
+from DDT.DDT import DDT
 from Algorithms.Cost.BarraCuDA import BarraCuDA
 
 
@@ -42,32 +42,24 @@ def apply_algorithm_BarraCuDA(ft, height):
     runtime = []
 
     for i in range(height):
+        # every height is timed from scratch, without subtree DDTs, cut sets or aggregates of smaller heights
+        FT.invalidate()
+        DDT.invalidate()
         start = timer()
 
         ddt = BarraCuDA(ft, i)
-        if i != 0:
-            ddt = ddt.remove_duplicate_vertices()
 
         end = timer()
 
         exp_cost.append(ddt.expected_cost())
-        exp_cost_failure.append(
-            ddt.expected_cost_failure() / ddt.fail_prob()
-        )
+        exp_cost_failure.append(ddt.expected_cost_given_failure())
         runtime.append(end - start)
+        # the DDT nodes of this height must not be reused by the next one
+        del ddt
 
     return exp_cost, exp_cost_failure, runtime
 
 
-# -------------------------
-# FT loader
-# -------------------------
-def load_ft(filepath):
-    FaultTree = FTParse(filepath)
-    FaultTree.unreliability(add_unreliability=True)
-    return FaultTree
-
-
 # -------------------------
 # Main experiment runner
 # -------------------------
@@ -84,16 +76,21 @@ def run_barracuda_experiment(cfg):
 
     os.makedirs(output_folder, exist_ok=True)
 
-    pattern = "**/*.dft" if recursive else "*.dft"
-    ft_files = glob.glob(os.path.join(ft_folder, pattern), recursive=recursive)
+    # the trees are parsed up front by a pool of processes
+    errors = {}
+    trees, _ = load_folder(ft_folder, recursive=recursive, errors=errors)
+
+    print(f"Found {len(trees) + len(errors)} fault trees.")
 
-    print(f"Found {len(ft_files)} fault trees.")
+    for fname, error in errors.items():
+        print(f"Error processing {os.path.join(ft_folder, fname)}: {error}")
 
-    for filepath in ft_files:
+    for fname, ft in trees.items():
+        filepath = os.path.join(ft_folder, fname)
         print(f"Processing: {filepath}")
 
         try:
-            ft = load_ft(filepath)
+            ft.unreliability(add_unreliability=True)
             height = ft.max_height()
 
             result, timed_out = run_with_timeout(
@@ -133,5 +130,7 @@ def run_barracuda_experiment(cfg):
         except Exception as e:
             print(f"Error processing {filepath}: {e}")
 
+    # the fault trees of exp3 are generated again on every run, their old entries are not read again
+    prune_cache()
     print("Finished BarraCuDA experiment.")
 
@@ -0,0 +1,187 @@
+import os
+import csv
+import yaml
+import tracemalloc
+import multiprocessing as mp
+
+from FaultTree.FTParser import FTParse
+from FaultTree.Traversal import postorder
+from Algorithms.Cost.CuDAcost import CuDAcost
+from Algorithms.Cost.BUDAcost import BUDAcost
+
+
+CONFIG_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+
+class DictFT:
+    """
+    Node layout of FT before it had slots: attribute dict and a list of children
+    """
+    def __init__(self, name, ftelement, children, prob, cost):
+        self.name = name
+        self.type = ftelement
+        self.children = list(children)
+        self.prob = prob
+        self.cost = cost
+        self._cache = None
+
+
+class DictDDT:
+    """
+    Node layout of DDT before it had slots: attribute dict and a list of children
+    """
+    def __init__(self, name, ddtelement, children, prob, cost):
+        self.name = name
+        self.type = ddtelement
+        self.children = list(children)
+        self.prob = prob
+        self.cost = cost
+        self._aggregates = None
+
+
+def load_config(yaml_file=os.path.join(CONFIG_FOLDER, "run_config.yaml")):
+    with open(yaml_file, "r") as f:
+        return yaml.safe_load(f)
+
+
+def measure(build):
+    """
+    :param build: function building a structure
+    :return: bytes allocated by build that are still held by the structure it returns
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+def copy_nodes(root, node_class, unfold=False):
+    """
+    Copies every node of a FT or DDT into node_class, names, types and numbers are shared with the original
+    :param unfold: copy shared nodes once per path, as the DDTs were stored before hash-consing
+    :return: copy of root
+    """
+    if unfold:
+        # post-order without sharing, the copies of the children of a node are the last ones on the stack
+        stack = []
+        for node in postorder(root):
+            k = len(node.children)
+            children = stack[len(stack) - k:]
+            del stack[len(stack) - k:]
+            stack.append(node_class(node.name, node.type, children, node.prob, node.cost))
+        return stack[0]
+
+    copies = {}
+    for node in postorder(root, unique=True):
+        copies[id(node)] = node_class(node.name, node.type, [copies[id(child)] for child in node.children],
+                                      node.prob, node.cost)
+    return copies[id(root)]
+
+
+def count_nodes(root, unfold=False):
+    return sum(1 for _ in postorder(root, unique=not unfold))
+
+
+def measure_file(file_path, algorithm):
+    ft = FTParse(file_path)
+    ft_nodes = count_nodes(ft)
+    ft_before = measure(lambda: copy_nodes(ft, DictFT))
+    ft_after = measure(lambda: copy_nodes(ft, type(ft)))
+
+    if algorithm == "CuDAcost":
+        ddt = CuDAcost(ft, ft.cut_set())
+    else:
+        ddt = BUDAcost(ft)
+    ddt_nodes = count_nodes(ddt)
+    tree_nodes = count_nodes(ddt, unfold=True)
+    ddt_before = measure(lambda: copy_nodes(ddt, DictDDT, unfold=True))
+    ddt_after = measure(lambda: copy_nodes(ddt, type(ddt)))
+
+    return {
+        "FT": os.path.basename(file_path),
+        "ft_nodes": ft_nodes,
+        "ft_bytes_per_node_before": ft_before / ft_nodes,
+        "ft_bytes_per_node_after": ft_after / ft_nodes,
+        "ddt_nodes_before": tree_nodes,
+        "ddt_nodes_after": ddt_nodes,
+        "ddt_bytes_per_node_before": ddt_before / tree_nodes,
+        "ddt_bytes_per_node_after": ddt_after / ddt_nodes,
+        "ddt_bytes_before": ddt_before,
+        "ddt_bytes_after": ddt_after,
+    }
+
+
+def _worker(q, file_path, algorithm):
+    try:
+        q.put(("OK", measure_file(file_path, algorithm)))
+    except Exception as e:
+        q.put(("ERR", repr(e)))
+
+
+def process_file(file_path, algorithm, timeout):
+    """
+    Measures a file in its own process, so every measurement starts from the same heap
+    :return: row of measurements, None if the algorithm timed out or failed
+    """
+    q = mp.Queue()
+    p = mp.Process(target=_worker, args=(q, file_path, algorithm))
+    p.start()
+    p.join(timeout)
+
+    if p.is_alive():
+        print(f"TIMEOUT: {file_path}")
+        p.terminate()
+        p.join()
+        return None
+
+    if q.empty():
+        print(f"NO RESULT (likely crash): {file_path}")
+        return None
+
+    status, payload = q.get()
+    if status == "ERR":
+        print(f"ERROR in worker ({payload}): {file_path}")
+        return None
+    return payload
+
+
+def run_memory_benchmark(config):
+    mp.set_start_method("spawn", force=True)
+
+    folder = os.path.join(CONFIG_FOLDER, config["folder"])
+    algorithm = config.get("algorithm", "CuDAcost")
+    timeout = config.get("timeout", 60)
+    output_file = os.path.join(CONFIG_FOLDER, config.get("output_file", "results/memory.csv"))
+
+    rows = []
+    for fname in sorted(os.listdir(folder)):
+        if fname.endswith(".dft"):
+            row = process_file(os.path.join(folder, fname), algorithm, timeout)
+            if row is not None:
+                rows.append(row)
+
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with open(output_file, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    def total(key):
+        return sum(row[key] for row in rows)
+
+    ft_nodes = total("ft_nodes")
+    print(f"FT nodes: {ft_nodes}")
+    print(f"  bytes/node before: {sum(r['ft_bytes_per_node_before'] * r['ft_nodes'] for r in rows) / ft_nodes:.1f}")
+    print(f"  bytes/node after : {sum(r['ft_bytes_per_node_after'] * r['ft_nodes'] for r in rows) / ft_nodes:.1f}")
+    print(f"{algorithm} DDT nodes before: {total('ddt_nodes_before')}, after: {total('ddt_nodes_after')}")
+    print(f"  bytes/node before: {total('ddt_bytes_before') / total('ddt_nodes_before'):.1f}")
+    print(f"  bytes/node after : {total('ddt_bytes_after') / total('ddt_nodes_after'):.1f}")
+    print(f"  total bytes before: {total('ddt_bytes_before')}, after: {total('ddt_bytes_after')}")
+    return rows
+
+
+if __name__ == "__main__":
+    run_memory_benchmark(load_config())
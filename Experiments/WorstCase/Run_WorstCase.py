@@ -1,6 +1,7 @@
 import pandas as pd
 import yaml
 from FaultTree.FTParser import *
+from FaultTree.FTCache import FTLoad
 from Algorithms.WorstCase import WorstCost
 from Algorithms.allcost import WorstCostTrue
 import os
@@ -22,7 +23,7 @@ def load_csv(file, metric):
 
 
 def obtain_worst_case(filename):
-    FT = FTParse(filename)
+    FT = FTLoad(filename)
     FT.unreliability(add_unreliability=True)
     wc = WorstCostTrue(FT)
     return wc
@@ -0,0 +1,58 @@
+from timeit import default_timer as timer
+
+
+class FTAnalysis:
+    """
+    Analyses of one fault tree that several algorithms need (cut sets, path sets, unreliability, variables,
+    probabilities and costs). Each analysis is computed on first use and then shared by every algorithm, the time it
+    took is kept in times, so runtimes can be reported with or without the preprocessing they rely on.
+    Results are shared and must not be modified.
+    """
+    def __init__(self, ft):
+        """
+        :param ft: fault tree
+        """
+        self.ft = ft
+        self.times = {}
+        self._results = {}
+
+    def _get(self, key, compute):
+        if key not in self._results:
+            start = timer()
+            self._results[key] = compute()
+            self.times[key] = timer() - start
+        return self._results[key]
+
+    def variables(self):
+        return self._get("variables", self.ft.variables)
+
+    def probabilities(self):
+        return self._get("probabilities", self.ft.probabilities)
+
+    def costs(self):
+        return self._get("costs", self.ft.cost_dict)
+
+    def unreliability(self):
+        """
+        :return: unreliability of the top event, the unreliability of every gate is stored in its prob
+        """
+        return self._get("unreliability", lambda: self.ft.unreliability(add_unreliability=True))
+
+    def cut_sets(self):
+        """
+        :return: list of all minimal cut sets, smallest first
+        """
+        return self._get("cut_sets", self.ft.cut_set)
+
+    def path_sets(self):
+        """
+        :return: list of all minimal path sets, smallest first
+        """
+        return self._get("path_sets", self.ft.path_set)
+
+    def preprocessing_time(self, *keys):
+        """
+        :param keys: names of analyses, e.g. "cut_sets"
+        :return: total time spent computing these analyses, 0 for the ones that were not computed
+        """
+        return sum(self.times.get(key, 0) for key in keys)
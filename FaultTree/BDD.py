@@ -0,0 +1,299 @@
+from .FaultTree import *
+from .Traversal import preorder, postorder, run_recursive
+
+AND = 0
+OR = 1
+
+
+class BDD:
+    """
+    Reduced ordered binary decision diagrams over the basic events of a fault tree, together with
+    zero-suppressed decision diagrams (ZDD) that represent families of sets (minimal cut sets / path sets).
+    Nodes are integers. BDD node 0 is false and 1 is true, ZDD node 0 is the empty family and 1 the family {{}}.
+    Level i is the i-th variable of the order, terminals have level len(order).
+    """
+    def __init__(self, order):
+        self.order = list(order)
+        self.level_of = {name: i for i, name in enumerate(self.order)}
+        terminal = len(self.order)
+
+        self.level = [terminal, terminal]
+        self.low = [0, 1]
+        self.high = [0, 1]
+        self.unique = {}
+        self.apply_memo = {}
+        self.cofactor_memo = {}
+        self.support_memo = {0: 0, 1: 0}
+
+        self.zlevel = [terminal, terminal]
+        self.zlow = [0, 1]
+        self.zhigh = [0, 1]
+        self.zunique = {}
+        self.minsol_memo = {}
+        self.without_memo = {}
+
+    @classmethod
+    def for_ft(cls, ft):
+        """
+        :param ft: fault tree
+        :return: manager ordering the basic events by their first occurrence in a depth-first walk of ft
+        """
+        order = []
+        seen = set()
+        for node in preorder(ft, unique=True):
+            if node.type == FtElementType.BE and node.name not in seen:
+                seen.add(node.name)
+                order.append(node.name)
+        return cls(order)
+
+    def node(self, level, low, high):
+        if low == high:
+            return low
+        key = (level, low, high)
+        result = self.unique.get(key)
+        if result is None:
+            result = len(self.level)
+            self.level.append(level)
+            self.low.append(low)
+            self.high.append(high)
+            self.unique[key] = result
+        return result
+
+    def variable(self, name):
+        return self.node(self.level_of[name], 0, 1)
+
+    def build(self, ft, dual=False):
+        """
+        :param ft: fault tree whose basic events are all in the order of this manager
+        :param dual: build the dual function (AND and OR swapped), whose minimal solutions are the path sets
+        :return: BDD node of the top event
+        """
+        return self.build_nodes(ft, dual)[id(ft)]
+
+    def build_nodes(self, ft, dual=False):
+        """
+        :return: dict id(FT node) -> BDD node, for every distinct node of ft
+        """
+        and_type = FtElementType.OR if dual else FtElementType.AND
+        nodes = {}
+        for node in postorder(ft, unique=True):
+            if node.type == FtElementType.BE:
+                nodes[id(node)] = self.variable(node.name)
+                continue
+            op = AND if node.type == and_type else OR
+            result = 1 if op == AND else 0
+            for child in node.children:
+                result = self.apply(op, result, nodes[id(child)])
+            nodes[id(node)] = result
+        return nodes
+
+    def apply(self, op, f, g):
+        result = self._apply_shortcut(op, f, g)
+        if result is None:
+            result = run_recursive(self._apply(op, f, g))
+        return result
+
+    def _apply_shortcut(self, op, f, g):
+        if f == g:
+            return f
+        if op == AND:
+            if f == 0 or g == 0:
+                return 0
+            if f == 1:
+                return g
+            if g == 1:
+                return f
+        else:
+            if f == 1 or g == 1:
+                return 1
+            if f == 0:
+                return g
+            if g == 0:
+                return f
+        if f > g:
+            f, g = g, f
+        return self.apply_memo.get((op, f, g))
+
+    def _apply(self, op, f, g):
+        if f > g:
+            f, g = g, f
+        level = min(self.level[f], self.level[g])
+        f0, f1 = (self.low[f], self.high[f]) if self.level[f] == level else (f, f)
+        g0, g1 = (self.low[g], self.high[g]) if self.level[g] == level else (g, g)
+
+        low = self._apply_shortcut(op, f0, g0)
+        if low is None:
+            low = yield self._apply(op, f0, g0)
+        high = self._apply_shortcut(op, f1, g1)
+        if high is None:
+            high = yield self._apply(op, f1, g1)
+
+        result = self.node(level, low, high)
+        self.apply_memo[(op, f, g)] = result
+        return result
+
+    def cofactor(self, f, name, value):
+        """
+        :param f: BDD node
+        :param name: variable
+        :param value: 0 or 1
+        :return: BDD node of f with the variable set to value
+        """
+        level = self.level_of[name]
+        if self.level[f] > level:
+            return f
+        if self.level[f] == level:
+            return self.high[f] if value else self.low[f]
+        result = self.cofactor_memo.get((f, level, value))
+        if result is None:
+            result = run_recursive(self._cofactor(f, level, value))
+        return result
+
+    def _cofactor(self, f, level, value):
+        if self.level[f] > level:
+            return f
+        if self.level[f] == level:
+            return self.high[f] if value else self.low[f]
+        key = (f, level, value)
+        if key in self.cofactor_memo:
+            return self.cofactor_memo[key]
+        low = yield self._cofactor(self.low[f], level, value)
+        high = yield self._cofactor(self.high[f], level, value)
+        result = self.node(self.level[f], low, high)
+        self.cofactor_memo[key] = result
+        return result
+
+    def support(self, f):
+        """
+        :param f: BDD node
+        :return: int with bit i set when the variable at level i occurs in f
+        """
+        memo = self.support_memo
+        if f not in memo:
+            def unknown_children(node):
+                return [child for child in self._children(node) if child not in memo]
+
+            for node in postorder(f, children=unknown_children, unique=True, key=int):
+                memo[node] = (1 << self.level[node]) | memo[self.low[node]] | memo[self.high[node]]
+        return memo[f]
+
+    def probability(self, roots, probabilities):
+        """
+        Exact probability of the functions, basic events are independent
+        :param roots: BDD nodes
+        :param probabilities: dict variable name -> probability
+        :return: list with the probability of each root
+        """
+        p = [probabilities[name] for name in self.order]
+        values = {0: 0.0, 1: 1.0}
+        for root in roots:
+            for node in postorder(root, children=self._children, unique=True, key=int):
+                if node not in values:
+                    level = self.level[node]
+                    values[node] = (1 - p[level]) * values[self.low[node]] + p[level] * values[self.high[node]]
+        return [values[root] for root in roots]
+
+    def _children(self, f):
+        return (self.low[f], self.high[f]) if f > 1 else ()
+
+    def zdd_node(self, level, low, high):
+        if high == 0:
+            return low
+        key = (level, low, high)
+        result = self.zunique.get(key)
+        if result is None:
+            result = len(self.zlevel)
+            self.zlevel.append(level)
+            self.zlow.append(low)
+            self.zhigh.append(high)
+            self.zunique[key] = result
+        return result
+
+    def minimal_solutions(self, f):
+        """
+        Minimal solutions of a monotone function (Rauzy's algorithm)
+        :param f: BDD node
+        :return: ZDD node of the family of minimal sets of variables that make f true
+        """
+        if f < 2:
+            return f
+        return run_recursive(self._minsol(f))
+
+    def _minsol(self, f):
+        if f < 2:
+            return f
+        if f in self.minsol_memo:
+            return self.minsol_memo[f]
+        high = yield self._minsol(self.high[f])
+        low = yield self._minsol(self.low[f])
+        high = yield self._without(high, low)
+        result = self.zdd_node(self.level[f], low, high)
+        self.minsol_memo[f] = result
+        return result
+
+    def _without(self, f, g):
+        """
+        :return: ZDD node of the sets in family f that are not a superset of any set in family g
+        """
+        if f == 0 or g == 1 or f == g:
+            return 0
+        if g == 0:
+            return f
+        if f == 1:
+            return 0 if self._has_empty(g) else 1
+        key = (f, g)
+        if key in self.without_memo:
+            return self.without_memo[key]
+
+        f_level, g_level = self.zlevel[f], self.zlevel[g]
+        if f_level < g_level:
+            low = yield self._without(self.zlow[f], g)
+            high = yield self._without(self.zhigh[f], g)
+            result = self.zdd_node(f_level, low, high)
+        elif f_level > g_level:
+            result = yield self._without(f, self.zlow[g])
+        else:
+            low = yield self._without(self.zlow[f], self.zlow[g])
+            high = yield self._without(self.zhigh[f], self.zlow[g])
+            high = yield self._without(high, self.zhigh[g])
+            result = self.zdd_node(f_level, low, high)
+
+        self.without_memo[key] = result
+        return result
+
+    def _has_empty(self, z):
+        while z > 1:
+            z = self.zlow[z]
+        return z == 1
+
+    def count(self, z):
+        """
+        :param z: ZDD node
+        :return: number of sets in the family
+        """
+        counts = {0: 0, 1: 1}
+        for node in postorder(z, children=self._zdd_children, unique=True, key=int):
+            if node > 1:
+                counts[node] = counts[self.zlow[node]] + counts[self.zhigh[node]]
+        return counts[z]
+
+    def _zdd_children(self, z):
+        return (self.zlow[z], self.zhigh[z]) if z > 1 else ()
+
+    def iter_sets(self, z):
+        """
+        Lazily enumerates a family of sets
+        :param z: ZDD node
+        :return: generator of lists of variable names, in the variable order
+        """
+        stack = [(z, ())]
+        while stack:
+            node, chosen = stack.pop()
+            if node == 0:
+                continue
+            if node == 1:
+                yield [self.order[level] for level in chosen]
+                continue
+            stack.append((self.zhigh[node], chosen + (self.zlevel[node],)))
+            stack.append((self.zlow[node], chosen))
+
@@ -0,0 +1,143 @@
+from array import array
+from math import isnan
+from .FaultTree import *
+from .Traversal import postorder
+
+
+NO_VALUE = float('nan')
+
+
+class CompiledFT:
+    """
+    Immutable, array based representation of a fault tree.
+    Every distinct node gets an integer ID in post-order, so children always have a smaller ID than their
+    parents and the top event has the largest ID. Children of node i are child_ids[child_offsets[i]:child_offsets[i+1]].
+    Probabilities and costs that are not set are stored as NaN.
+    """
+    def __init__(self, names, types, child_offsets, child_ids, prob, cost):
+        self.names = tuple(names)
+        self.types = types
+        self.child_offsets = child_offsets
+        self.child_ids = child_ids
+        self.prob = prob
+        self.cost = cost
+        self.index = {}
+        for i, name in enumerate(self.names):
+            self.index.setdefault(name, i)
+        self.root = len(self.names) - 1
+
+    @classmethod
+    def from_ft(cls, ft):
+        """
+        Compiles an FT object, nodes that are shared (DAG) are compiled once
+        :param ft: top event of the fault tree
+        :return: compiled fault tree
+        """
+        nodes = list(postorder(ft, unique=True))
+        ids = {id(node): i for i, node in enumerate(nodes)}
+
+        records = [
+            (node.name, node.type, [ids[id(child)] for child in node.children], node.prob, node.cost)
+            for node in nodes
+        ]
+        return cls._from_ordered(records)
+
+    @classmethod
+    def from_records(cls, top, records):
+        """
+        Compiles the name based records of a parsed .dft file without building FT objects
+        :param top: name of the top event
+        :param records: dict name -> (FtElementType, children names, prob, cost)
+        :return: compiled fault tree
+        """
+        order = list(postorder(top, children=lambda name: [c for c in records[name][1] if c in records],
+                               unique=True, key=lambda name: name))
+        ids = {name: i for i, name in enumerate(order)}
+
+        ordered = []
+        for name in order:
+            ftype, children, prob, cost = records[name]
+            ordered.append((name, ftype, [ids[c] for c in children if c in records], prob, cost))
+        return cls._from_ordered(ordered)
+
+    @classmethod
+    def _from_ordered(cls, records):
+        names = []
+        types = array('b')
+        child_offsets = array('l', [0])
+        child_ids = array('l')
+        prob = array('d')
+        cost = array('d')
+        for name, ftype, children, p, c in records:
+            names.append(name)
+            types.append(ftype.value)
+            child_ids.extend(children)
+            child_offsets.append(len(child_ids))
+            prob.append(NO_VALUE if p is None else p)
+            cost.append(NO_VALUE if c is None else c)
+        return cls(names, types, child_offsets, child_ids, prob, cost)
+
+    def __len__(self):
+        return len(self.names)
+
+    def compile(self):
+        return self
+
+    def type_of(self, node):
+        return FtElementType(self.types[node])
+
+    def children(self, node):
+        return self.child_ids[self.child_offsets[node]:self.child_offsets[node + 1]]
+
+    def find(self, name):
+        """
+        :param name: name of a vertex
+        :return: ID of the vertex, None if the fault tree does not contain it
+        """
+        return self.index.get(name)
+
+    def prob_of(self, name):
+        return _value(self.prob[self.index[name]])
+
+    def cost_of(self, name):
+        return _value(self.cost[self.index[name]])
+
+    def max_height(self):
+        """
+        :return: number of levels of the fault tree, a basic event has one level
+        """
+        levels = []
+        for node in range(len(self)):
+            levels.append(1 + max((levels[child] for child in self.children(node)), default=0))
+        return levels[self.root]
+
+    def basic_events(self):
+        be = FtElementType.BE.value
+        return [i for i in range(len(self.names)) if self.types[i] == be]
+
+    def variables(self):
+        return {self.names[i] for i in self.basic_events()}
+
+    def vertices(self):
+        return set(self.names)
+
+    def probabilities(self):
+        return {self.names[i]: _value(self.prob[i]) for i in self.basic_events()}
+
+    def cost_dict(self):
+        return {self.names[i]: _value(self.cost[i]) for i in self.basic_events()}
+
+    def to_ft(self):
+        """
+        Rebuilds FT objects from the compiled representation, shared nodes stay shared
+        :return: top event of the fault tree
+        """
+        nodes = []
+        for i, name in enumerate(self.names):
+            nodes.append(FT(name, self.type_of(i), children=[nodes[c] for c in self.children(i)],
+                            prob=_value(self.prob[i]), cost=_value(self.cost[i])))
+        return nodes[self.root]
+
+
+def _value(x):
+    return None if isnan(x) else x
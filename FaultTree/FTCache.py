@@ -0,0 +1,287 @@
+"""
+Binary cache of parsed .dft files. An entry holds the arrays of the CompiledFT, the metrics of the file and counts
+that were computed for it (e.g. the number of minimal cut sets). Entries are named after the SHA-1 of the file
+content, so a changed file is parsed again and never reads a stale entry. The entries of all folders are kept in
+CACHE_DIR, outside the folders of .dft files that the experiments scan. An entry is read in one call and its arrays
+are copied out of the bytes, so no file stays open and the entry can be replaced while the fault tree is in use.
+Entries of files that are rewritten get new names, prune_cache removes the least recently used entries.
+
+Layout of an entry: MAGIC, length of the header (uint32), JSON header, padding to 8 bytes, then child_offsets
+(int64), child_ids (int64), prob (float64), cost (float64), types (int8) and the names (UTF-8, separated by NUL).
+"""
+
+import hashlib
+import json
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from timeit import default_timer as timer
+from .CompiledFT import CompiledFT
+from .FTParser import FTParse, parse_lines
+
+MAGIC = b"FTC2"
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".ftcache")
+CACHE_MAX_BYTES = 256 * 2 ** 20
+
+
+def FTLoad(filename, compiled=False, metrics=None, cache_dir=None):
+    """
+    Parses a Galileo (.dft) file through the binary cache
+    :param filename: path of the .dft file
+    :param compiled: return a CompiledFT instead of FT objects
+    :param metrics: optional dict that receives the metrics of the file, see FTParse
+    :param cache_dir: directory of the cache, CACHE_DIR if not given
+    :return: top event of the fault tree
+    """
+    ft, header = _load(filename, cache_dir)
+    if metrics is not None:
+        metrics.update(header["metrics"])
+    return ft if compiled else ft.to_ft()
+
+
+def cut_set_count(filename, ft=None, cache_dir=None, digest=None):
+    """
+    :param filename: path of the .dft file
+    :param ft: fault tree parsed from the file, used to count the cut sets when they are not cached yet
+    :param digest: content hash of the file when it is already known (see load_folder), the file is then only read
+        when the cache has no entry for it
+    :return: number of minimal cut sets of the fault tree, cached with the parsed file
+    """
+    return _count(filename, "cut_sets", lambda tree: tree.cut_set_count(), ft, cache_dir, digest)
+
+
+def path_set_count(filename, ft=None, cache_dir=None, digest=None):
+    """
+    :return: number of minimal path sets of the fault tree, see cut_set_count
+    """
+    return _count(filename, "path_sets", lambda tree: tree.path_set_count(), ft, cache_dir, digest)
+
+
+def _count(filename, key, count, ft, cache_dir, digest):
+    compiled = None
+    if digest is not None:
+        try:
+            compiled, header = _read(_entry_path(digest, cache_dir))
+        except (OSError, ValueError):
+            pass
+    if compiled is None:
+        compiled, header = _load(filename, cache_dir)
+    if key not in header["counts"]:
+        header["counts"][key] = count(ft if ft is not None else compiled.to_ft())
+        _write(_entry_path(header["hash"], cache_dir), compiled, header)
+    return header["counts"][key]
+
+
+def _entry_path(digest, cache_dir):
+    return os.path.join(CACHE_DIR if cache_dir is None else cache_dir, digest + ".ftc")
+
+
+def _load(filename, cache_dir):
+    """
+    :return: (CompiledFT, header) of the file, parsed and stored when the cache has no entry for its content
+    """
+    with open(filename, "rb") as file:
+        content = file.read()
+    digest = hashlib.sha1(content).hexdigest()
+    path = _entry_path(digest, cache_dir)
+    if os.path.exists(path):
+        try:
+            return _read(path)
+        except (OSError, ValueError):
+            pass
+
+    metrics = {}
+    ft = parse_lines(content.decode().splitlines(), compiled=True, metrics=metrics)
+    header = {"hash": digest, "metrics": metrics, "counts": {}}
+    _write(path, ft, header)
+    return ft, header
+
+
+def _write(path, ft, header):
+    """
+    Stores the entry through a temporary file, a cache that cannot be written is skipped
+    """
+    header = dict(header, n=len(ft), m=len(ft.child_ids))
+    header_bytes = json.dumps(header).encode()
+    header_bytes += b" " * (-(len(MAGIC) + 4 + len(header_bytes)) % 8)
+    names = "\0".join(ft.names).encode()
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temporary, "wb") as file:
+            file.write(MAGIC)
+            file.write(len(header_bytes).to_bytes(4, "little"))
+            file.write(header_bytes)
+            file.write(array("q", ft.child_offsets).tobytes())
+            file.write(array("q", ft.child_ids).tobytes())
+            file.write(array("d", ft.prob).tobytes())
+            file.write(array("d", ft.cost).tobytes())
+            file.write(array("b", ft.types).tobytes())
+            file.write(names)
+        os.replace(temporary, path)
+    except OSError:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def _read(path):
+    """
+    :return: (CompiledFT, header) of the entry
+    """
+    with open(path, "rb") as file:
+        data = memoryview(file.read())
+    # the modification time orders the entries by their last use for prune_cache
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not a fault tree cache entry")
+    offset = len(MAGIC) + 4
+    header_length = int.from_bytes(data[len(MAGIC):offset], "little")
+    header = json.loads(bytes(data[offset:offset + header_length]))
+    header["metrics"]["arity"] = {int(arity): gates for arity, gates in header["metrics"].get("arity", {}).items()}
+    offset += header_length
+
+    n, m = header.pop("n"), header.pop("m")
+    arrays = []
+    for typecode, copy_typecode, size, length in (("q", "l", 8, n + 1), ("q", "l", 8, m), ("d", "d", 8, n),
+                                                  ("d", "d", 8, n), ("b", "b", 1, n)):
+        chunk = data[offset:offset + size * length]
+        values = array(copy_typecode)
+        if values.itemsize == size:
+            values.frombytes(chunk)
+        else:
+            # e.g. 'l' has 4 bytes on Windows
+            values.extend(chunk.cast(typecode))
+        arrays.append(values)
+        offset += size * length
+    names = bytes(data[offset:]).decode().split("\0") if n else []
+    child_offsets, child_ids, prob, cost, types = arrays
+    return CompiledFT(names, types, child_offsets, child_ids, prob, cost), header
+
+
+def prune_cache(cache_dir=None, max_bytes=CACHE_MAX_BYTES):
+    """
+    Removes the least recently used entries until the cache holds at most max_bytes, e.g. after an experiment that
+    rewrites its .dft files
+    :param cache_dir: directory of the cache, CACHE_DIR if not given
+    :param max_bytes: size the entries may take together
+    :return: number of removed entries
+    """
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return 0
+    entries = []
+    for name in names:
+        if name.endswith(".ftc"):
+            try:
+                stat = os.stat(os.path.join(cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+    entries.sort(reverse=True)
+    total, removed = 0, 0
+    for _, size, name in entries:
+        total += size
+        if total > max_bytes:
+            try:
+                os.remove(os.path.join(cache_dir, name))
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def load_folder(folder, recursive=False, compiled=False, workers=None, chunksize=None, use_cache=True,
+                extension=".dft", metrics=None, errors=None, digests=None, cache_dir=None, paths=None):
+    """
+    Parses every fault tree of a folder in a pool of processes, each process parses a chunk of the files
+    :param folder: folder with the .dft files
+    :param recursive: also parse the files in the subfolders, hidden folders are skipped
+    :param compiled: return CompiledFTs instead of FT objects
+    :param workers: number of processes, os.cpu_count() if not given, 1 parses in this process
+    :param chunksize: number of files a process parses at a time, chosen from the number of files if not given
+    :param use_cache: parse through the binary cache (FTLoad) instead of FTParse
+    :param extension: only files with this extension are parsed
+    :param metrics: optional dict that receives the metrics of every file (path relative to folder -> metrics)
+    :param errors: optional dict that receives the files that could not be parsed (path -> repr of the exception),
+        the first error is raised if not given
+    :param digests: optional dict that receives the content hash of every file parsed through the cache (path ->
+        hash), for cut_set_count and path_set_count
+    :param cache_dir: directory of the cache, CACHE_DIR if not given
+    :param paths: paths, relative to folder, of the files to parse instead of the files found with recursive and
+        extension
+    :return: (dict path relative to folder -> top event, dict path -> seconds spent parsing the file), in the
+        order of the sorted paths
+    """
+    paths = _ft_files(folder, recursive, extension) if paths is None else sorted(paths)
+    tasks = [(os.path.join(folder, path), use_cache, cache_dir) for path in paths]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        results = map(_load_file, tasks)
+    else:
+        if chunksize is None:
+            # a few chunks per process balance files of different sizes
+            chunksize = max(1, -(-len(tasks) // (4 * workers)))
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(_load_file, tasks, chunksize=chunksize)
+
+    trees, timings = {}, {}
+    try:
+        for path, (ft, seconds, file_metrics, digest, error) in zip(paths, results):
+            if error is not None:
+                if errors is None:
+                    raise error
+                errors[path] = repr(error)
+                continue
+            if not compiled:
+                start = timer()
+                ft = ft.to_ft()
+                seconds += timer() - start
+            trees[path] = ft
+            timings[path] = seconds
+            if metrics is not None:
+                metrics[path] = file_metrics
+            if digests is not None and digest is not None:
+                digests[path] = digest
+    finally:
+        if workers > 1:
+            executor.shutdown(cancel_futures=True)
+    return trees, timings
+
+
+def _ft_files(folder, recursive, extension):
+    """
+    :return: sorted paths, relative to folder, of the files with the extension
+    """
+    paths = []
+    for root, folders, files in os.walk(folder):
+        folders[:] = [name for name in folders if not name.startswith(".")] if recursive else []
+        relative = os.path.relpath(root, folder)
+        paths.extend(os.path.normpath(os.path.join(relative, name)) for name in files if name.endswith(extension))
+    return sorted(paths)
+
+
+def _load_file(task):
+    """
+    Parses a file in a process of load_folder
+    :return: (CompiledFT, seconds, metrics, content hash, exception), the hash is None when the file was not parsed
+        through the cache and the exception is None when the file was parsed
+    """
+    filename, use_cache, cache_dir = task
+    metrics = {}
+    digest = None
+    start = timer()
+    try:
+        if use_cache:
+            ft, header = _load(filename, cache_dir)
+            metrics.update(header["metrics"])
+            digest = header["hash"]
+        else:
+            ft = FTParse(filename, compiled=True, metrics=metrics)
+    except Exception as error:
+        return None, timer() - start, metrics, None, error
+    return ft, timer() - start, metrics, digest, None
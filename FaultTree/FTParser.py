@@ -1,39 +1,89 @@
 # from FaultTree import *
+import re
 from .FaultTree import *
+from .CompiledFT import CompiledFT
 
-def FTParse(filename):
-    fts = {}
+# a token is a quoted name or a run of characters without white space, quotes and semicolons
+_TOKEN = re.compile(r'"([^"]*)"|([^\s";]+)')
+# gate keywords are matched as substrings, in this order, as in the original parser
+_GATE_TYPES = (("or", FtElementType.OR), ("and", FtElementType.AND))
+
+
+def FTParse(filename, compiled=False, metrics=None):
+    """
+    Parses a Galileo (.dft) file in a single pass over its lines
+    :param filename: path of the .dft file
+    :param compiled: return a CompiledFT instead of FT objects
+    :param metrics: optional dict that receives the metrics of the file: number of basic event ("bes") and gate
+        ("gates") statements, histogram of the number of children of the gates ("arity", dict number -> gates)
+        and number of levels of the fault tree ("depth", None if the fault tree has a cycle)
+    :return: top event of the fault tree, a ValueError is raised when the fault tree has a cycle
+    """
     with open(filename, "r") as file:
-        for line in file:
-            line = line.strip().replace('"', '').replace(';', '')
-            linelist = line.split()
-            if len(linelist) == 0:
-                continue
-            if "toplevel" in linelist[0]:
-                top = linelist[1]
-                continue
-            name = linelist[0]
-            if "or" in linelist[1]:
-                FTtype = FtElementType.OR
-                children = linelist[2:]
+        return parse_lines(file, compiled, metrics)
+
+
+def parse_lines(lines, compiled=False, metrics=None):
+    """
+    Parses the lines of a Galileo (.dft) file, see FTParse
+    :param lines: iterable of lines
+    """
+    records = {}
+    bes = gates = 0
+    arity = {}
+    for line in lines:
+        tokens = [quoted or bare for quoted, bare in _TOKEN.findall(line)]
+        if len(tokens) < 2:
+            continue
+        # also matches the renamed top lines ("toplevel_A" name) that FTcombine writes
+        if "toplevel" in tokens[0]:
+            top = tokens[1]
+            continue
+        name, kind = tokens[0], tokens[1]
+        gate_type = _gate_type(kind)
+        if gate_type is not None:
+            records[name] = (gate_type, tokens[2:], None, None)
+            gates += 1
+            arity[len(tokens) - 2] = arity.get(len(tokens) - 2, 0) + 1
+        elif "prob" in kind or "lambda" in kind:
+            prob = float(kind.split('=')[1])
+            cost = None
+            for token in tokens[2:]:
+                if token.startswith("cost="):
+                    cost = float(token.split('=')[1])
+                    break
+            records[name] = (FtElementType.BE, [], prob, cost)
+            bes += 1
+    if metrics is not None:
+        metrics["bes"] = bes
+        metrics["gates"] = gates
+        metrics["arity"] = arity
+    # a fault tree with a cycle is rejected with the same error whether it is compiled or not
+    try:
+        if compiled:
+            ft = CompiledFT.from_records(top, records)
+        else:
+            fts = {name: FT(name, ftype, list(children), prob=prob, cost=cost)
+                   for name, (ftype, children, prob, cost) in records.items()}
+            for node in fts.values():
+                if hasattr(node, "children") and node.children is not None:
+                    node.children = [fts[c] for c in node.children if c in fts]
+            ft = fts[top]
+        depth = ft.max_height()
+    except ValueError as error:
+        if metrics is not None:
+            metrics["depth"] = None
+        raise ValueError(f"fault tree {top} contains a cycle") from error
+    if metrics is not None:
+        metrics["depth"] = depth
+    return ft
 
-                ft_node = FT(name, FTtype, children)
-                fts[name] = ft_node
-            elif "and" in linelist[1]:
-                FTtype = FtElementType.AND
-                children = linelist[2:]
 
-                ft_node = FT(name, FTtype, children)
-                fts[name] = ft_node
-            elif "prob" in linelist[1] or "lambda" in linelist[1]:
-                prob = float(linelist[1].split('=')[1])
-                if len(linelist) > 2 and 'cost' in linelist[2]:
-                    cost = float(linelist[2].split('=')[1])
-                else:
-                    cost = None
-                ft_node = FT(name, FtElementType.BE, prob=prob, cost=cost)
-                fts[name] = ft_node
-    for node in fts.values():
-        if hasattr(node, "children") and node.children is not None:
-            node.children = [fts[c] for c in node.children if c in fts]
-    return fts[top]
+def _gate_type(kind):
+    """
+    :return: FtElementType of the gate keyword kind, None if kind is not a gate
+    """
+    for keyword, gate_type in _GATE_TYPES:
+        if keyword in kind:
+            return gate_type
+    return None
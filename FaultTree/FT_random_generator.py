@@ -1,3 +1,5 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
 from .FaultTree import *
 import numpy as np
 
@@ -87,6 +89,132 @@ def save_ft(ft, output):
         f.write("\n".join(new_lines))
 
 
+def generate_batch(specs, folder, seed=None, workers=None, chunksize=1000):
+    """
+    Generates many random fault trees at once, with the same distribution as FaultTreeGenerator.generate_FT, and
+    writes them to folder as save_ft does. The trees are generated a chunk at a time, level by level for all trees
+    of the chunk: the children of all gates of a level and the splits of their budgets are drawn as arrays, the
+    splits from a multinomial. Every chunk has its own random stream spawned from seed, so the trees only depend on
+    seed and chunksize, not on the number of processes.
+    :param specs: list of (file name, number of basic events, probability of an OR gate, maximum number of children)
+    :param folder: output folder
+    :param seed: seed of the random streams, fresh entropy if not given
+    :param workers: number of processes, os.cpu_count() if not given, 1 generates in this process
+    :param chunksize: number of trees generated at once
+    :return: paths of the written files, in the order of specs
+    """
+    os.makedirs(folder, exist_ok=True)
+    chunks = [specs[i:i + chunksize] for i in range(0, len(specs), chunksize)]
+    streams = np.random.SeedSequence(seed).spawn(len(chunks))
+    tasks = [(chunk, folder, stream) for chunk, stream in zip(chunks, streams)]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        results = list(map(_generate_chunk, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_generate_chunk, tasks))
+    return [path for paths in results for path in paths]
+
+
+def _generate_chunk(task):
+    """
+    Generates and writes the trees of a chunk of generate_batch
+    :return: paths of the written files
+    """
+    specs, folder, seed = task
+    rng = np.random.default_rng(seed)
+    budgets = np.array([spec[1] for spec in specs], dtype=np.int64)
+    or_probs = np.array([spec[2] for spec in specs], dtype=float)
+    max_children = np.floor([spec[3] for spec in specs]).astype(np.int64)
+    if (budgets < 1).any():
+        raise ValueError("a fault tree needs at least one basic event")
+
+    tree, budget, first_child, children = _structure(rng, budgets, max_children)
+    gates = np.flatnonzero(children)
+    bes = np.flatnonzero(children == 0)
+    is_or = np.zeros(len(tree), dtype=bool)
+    is_or[gates] = rng.random(len(gates)) < or_probs[tree[gates]]
+    prob = np.zeros(len(tree))
+    prob[bes] = np.clip(rng.uniform(0.00001, 0.01, len(bes)), 0, 1)
+    cost = np.zeros(len(tree), dtype=np.int64)
+    cost[bes] = rng.geometric(0.01, len(bes))
+
+    first_child, children, is_or, cost = first_child.tolist(), children.tolist(), is_or.tolist(), cost.tolist()
+    prob = [f"{p:.3e}" for p in prob.tolist()]
+    paths = []
+    for root, spec in enumerate(specs):
+        text = _dft_text(root, first_child, children, is_or, prob, cost)
+        path = os.path.join(folder, spec[0])
+        with open(path, "w") as f:
+            f.write(text)
+        paths.append(path)
+    return paths
+
+
+def _structure(rng, budgets, max_children):
+    """
+    Draws the shape of the trees level by level. Node i < len(budgets) is the top event of tree i, the children of
+    a gate are consecutive nodes.
+    :return: arrays (tree, budget, first child, number of children) indexed by node, basic events have no children
+    """
+    tree = np.arange(len(budgets))
+    budget = budgets
+    levels = []
+    size = len(budgets)
+    while len(budget):
+        gate = budget > 1
+        children = np.zeros(len(budget), dtype=np.int64)
+        high = np.minimum(max_children[tree[gate]], budget[gate])
+        children[gate] = rng.integers(2, high, endpoint=True)
+        first = np.cumsum(children) - children
+        levels.append((tree, budget, size + first, children))
+        size += int(children.sum())
+
+        # every gate gives one basic event to each child, the rest is split uniformly over its children
+        rest = np.where(gate, budget - children, 0)
+        split = rng.multinomial(rest[gate], _uniform(children[gate]))
+        budget = 1 + split[np.arange(split.shape[1]) < children[gate][:, None]]
+        tree = np.repeat(tree, children)
+    return tuple(np.concatenate(arrays) for arrays in zip(*levels))
+
+
+def _uniform(children):
+    """
+    :return: matrix with row i uniform over the first children[i] columns
+    """
+    columns = np.arange(max(children, default=1))
+    return np.where(columns < children[:, None], 1.0 / np.maximum(children, 1)[:, None], 0.0)
+
+
+def _dft_text(root, first_child, children, is_or, prob, cost):
+    """
+    :return: content of the .dft file of the tree with top event root, names and lines in the order of save_ft
+    """
+    names = {}
+    order = []
+    counters = {"BE": 0, "G": 0}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        kind = "G" if children[node] else "BE"
+        counters[kind] += 1
+        names[node] = f"{kind}{counters[kind]}"
+        order.append(node)
+        stack.extend(reversed(range(first_child[node], first_child[node] + children[node])))
+
+    lines = [f"toplevel \"{names[root]}\";"]
+    be_lines = []
+    for node in order:
+        if children[node]:
+            children_names = " ".join(f"\"{names[child]}\""
+                                      for child in range(first_child[node], first_child[node] + children[node]))
+            lines.append(f"\"{names[node]}\" {'or' if is_or[node] else 'and'} {children_names};")
+        else:
+            be_lines.append(f"\"{names[node]}\" prob={prob[node]} cost={cost[node]};")
+    lines.extend(be_lines)
+    return "\n".join(lines)
+
+
 if __name__ == "__main__":
     for i in range(2, 50):
         for j in range(1,11):
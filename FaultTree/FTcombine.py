@@ -64,57 +64,194 @@ def FTsave(FTgates, FTbes, output):
             # f.write(f"{first} {prob} {cost};\n")
 
 
+class CombinedFT:
+    """
+    Fault tree that random_gen combines in memory. The gates and basic events are the lines FTsave writes, in the
+    same order, indexed by name: the gates that have a name as child and the definition of every name, which is the
+    last line for the name as FTParse reads the file (basic events come after the gates). The number of levels of
+    every node is cached and only recomputed for the ancestors of the lines that change.
+    """
+    def __init__(self, gates, bes):
+        """
+        :param gates: gate lines [name, type, children...], the first one is the top event
+        :param bes: basic event lines [name, prob, cost]
+        """
+        self.front = []  # gates put in front of the others, the first gate last
+        self.gates = []
+        self.bes = []
+        self.parents = {}
+        self.definition = {}
+        self.levels = {}
+        self.add(gates, bes)
+
+    def top(self):
+        return self.front[-1][0] if self.front else self.gates[0][0]
+
+    def lines(self):
+        """
+        :return: (gates, bes) in the order FTsave writes them
+        """
+        return self.front[::-1] + self.gates, self.bes
+
+    def add(self, gates, bes):
+        """
+        Appends the lines of another fault tree, they replace the definitions of names that are already defined
+        """
+        for gate in gates:
+            self.gates.append(gate)
+            self._index(gate)
+            if self.definition.get(gate[0], gate) is not None:
+                self._define(gate[0], gate)
+        for be in bes:
+            self.bes.append(be)
+            self._define(be[0], None)
+
+    def prepend(self, gate):
+        """
+        Puts a gate in front of the others, it becomes the top event
+        """
+        self.front.append(gate)
+        self._index(gate)
+        if gate[0] not in self.definition:
+            self._define(gate[0], gate)
+
+    def replace(self, name, new):
+        """
+        Replaces the first occurrence of the child name in every gate by new
+        """
+        for gate in self.parents.pop(name, []):
+            if new not in gate[2:]:
+                self.parents.setdefault(new, []).append(gate)
+            gate[gate.index(name, 2)] = new
+            if name in gate[2:]:
+                self.parents.setdefault(name, []).append(gate)
+            if self.definition.get(gate[0]) is gate:
+                self._changed(gate[0])
+
+    def height(self):
+        """
+        :return: number of levels of the fault tree that FTParse reads from the lines, see FT.max_height
+        """
+        levels = self.levels
+        stack = [(self.top(), False)]
+        active = set()
+        while stack:
+            name, expanded = stack.pop()
+            if name in levels:
+                continue
+            gate = self.definition[name]
+            if gate is None:
+                levels[name] = 1
+                continue
+            # children without a line are dropped by the parser
+            children = [child for child in gate[2:] if child in self.definition]
+            if expanded:
+                active.discard(name)
+                levels[name] = 1 + max((levels[child] for child in children), default=0)
+                continue
+            if name in active:
+                raise ValueError(f"fault tree has a cycle through {name}")
+            active.add(name)
+            stack.append((name, True))
+            stack.extend((child, False) for child in children if child not in levels)
+        return levels[self.top()]
+
+    def _index(self, gate):
+        for child in dict.fromkeys(gate[2:]):
+            self.parents.setdefault(child, []).append(gate)
+
+    def _define(self, name, gate):
+        self.definition[name] = gate
+        self._changed(name)
+
+    def _changed(self, name):
+        """
+        Drops the cached levels of name and its ancestors
+        """
+        self.levels.pop(name, None)
+        stack = [name]
+        while stack:
+            for gate in self.parents.get(stack.pop(), ()):
+                if gate[0] in self.levels and self.definition.get(gate[0]) is gate:
+                    del self.levels[gate[0]]
+                    stack.append(gate[0])
+
+    def random_BE(self, gates, bes):
+        """
+        Replaces a random basic event by the fault tree (gates, bes)
+        """
+        be = self.bes[np.random.randint(len(self.bes))][0]
+        if self.parents.get(be) and gates[0][0] == "System":
+            gates[0][0] = "Sys2"
+        self.replace(be, gates[0][0])
+        self.add(gates, bes)
+
+    def random_shared_be(self, gates, bes, gatetype):
+        """
+        Puts a new top gate over this fault tree and (gates, bes), where a random basic event of (gates, bes) is
+        replaced by a random basic event of this fault tree
+        """
+        new_gate = ["TOPGATE", gatetype, self.top(), gates[0][0]]
+        be1 = self.bes[np.random.randint(len(self.bes))][0]
+        be2 = bes[np.random.randint(len(bes))][0]
+        for gate in gates:
+            if be2 in gate:
+                gate[gate.index(be2)] = be1
+        self.add(gates, bes)
+        self.prepend(new_gate)
+
+    def new_TOP(self, gates, bes, gatetype):
+        """
+        Puts a new top gate over this fault tree and (gates, bes)
+        """
+        new_gate = ["TOPGATE", gatetype, self.top(), gates[0][0]]
+        self.add(gates, bes)
+        self.prepend(new_gate)
+
+
 def random_BE(FT1gates, FT1bes, FT2gates, FT2bes):
-    gate = np.random.randint(len(FT1bes))
-    be = FT1bes[gate][0]
-    for i in FT1gates:
-        if be in i:
-            index1 = FT1gates.index(i)
-            index2 = FT1gates[index1].index(be)
-            if FT2gates[0][0] == "System":
-                FT2gates[0][0] = "Sys2"
-            FT1gates[index1][index2] = FT2gates[0][0]
-    return FT1gates + FT2gates, FT1bes + FT2bes
+    combined = CombinedFT(FT1gates, FT1bes)
+    combined.random_BE(FT2gates, FT2bes)
+    return combined.lines()
 
 def random_shared_be(FT1gates, FT1bes, FT2gates, FT2bes, GATETYPE):
-    new_gate = ["TOPGATE", GATETYPE, FT1gates[0][0], FT2gates[0][0]]
-    gate1 = np.random.randint(len(FT1bes))
-    be1 = FT1bes[gate1][0]
-    gate2 = np.random.randint(len(FT2bes))
-    be2 = FT2bes[gate2][0]
-    for i in FT2gates:
-        if be2 in i:
-            index1 = FT2gates.index(i)
-            index2 = FT2gates[index1].index(be2)
-            FT2gates[index1][index2] = be1
-    return [new_gate] + FT1gates + FT2gates, FT1bes + FT2bes
+    combined = CombinedFT(FT1gates, FT1bes)
+    combined.random_shared_be(FT2gates, FT2bes, GATETYPE)
+    return combined.lines()
 
 def new_TOP(FT1gates, FT1bes, FT2gates, FT2bes, GATETYPE):
-    new_gate = ["TOPGATE", GATETYPE, FT1gates[0][0], FT2gates[0][0]]
-    return [new_gate] + FT1gates + FT2gates, FT1bes + FT2bes
+    combined = CombinedFT(FT1gates, FT1bes)
+    combined.new_TOP(FT2gates, FT2bes, GATETYPE)
+    return combined.lines()
 
 def random_gen(folder, min_size, temp_path):
-    FTfile = np.random.choice(os.listdir(folder))
-    new_ft = FTpartialparser(os.path.join(folder, FTfile), "A")
+    """
+    Combines random fault trees of folder until the combination has at least min_size levels. The combination is
+    kept in memory and written to temp_path once at the end
+    :return: (gates, bes) lines of the combined fault tree, see FTsave
+    """
+    # hidden entries, e.g. the cache of parsed trees, are not fault trees
+    files = [name for name in os.listdir(folder) if not name.startswith(".")]
+    FTfile = np.random.choice(files)
+    new_ft = CombinedFT(*FTpartialparser(os.path.join(folder, FTfile), "A"))
     extension = 1
     height = 0
     while height < min_size:
-        ext_ftfile = np.random.choice(os.listdir(folder))
+        ext_ftfile = np.random.choice(files)
         ext_ft = FTpartialparser(os.path.join(folder, ext_ftfile), str(extension))
         choice = np.random.randint(1, 4)
         if choice == 1:
-            new_ft = random_BE(new_ft[0], new_ft[1], ext_ft[0], ext_ft[1])
+            new_ft.random_BE(ext_ft[0], ext_ft[1])
         elif choice == 2:
-            new_ft = random_shared_be(new_ft[0], new_ft[1], ext_ft[0], ext_ft[1], np.random.choice(["and", "or"]))
+            new_ft.random_shared_be(ext_ft[0], ext_ft[1], np.random.choice(["and", "or"]))
         elif choice == 3:
-            new_ft = new_TOP(new_ft[0], new_ft[1], ext_ft[0], ext_ft[1], np.random.choice(["and", "or"]))
-        FTsave(new_ft[0], new_ft[1], temp_path)
-        FTparsed = FTParse(temp_path)
-        height = FTparsed.max_height()
+            new_ft.new_TOP(ext_ft[0], ext_ft[1], np.random.choice(["and", "or"]))
+        height = new_ft.height()
         print(height)
         extension += 1
-    return new_ft
-
+    gates, bes = new_ft.lines()
+    FTsave(gates, bes, temp_path)
+    return gates, bes
 
 if __name__ == "__main__":
     folder = "FTs/FFORT"
@@ -1,5 +1,5 @@
 from enum import Enum
-from itertools import product
+from .Traversal import preorder, postorder, evaluate
 
 
 class FtElementType(Enum):
@@ -8,92 +8,167 @@ class FtElementType(Enum):
     OR = 3
 
 
+# element type of every type code, nodes store the code (FtElementType.value) of their type
+_FT_TYPES = (None, FtElementType.BE, FtElementType.AND, FtElementType.OR)
+
+
+def _invalidating(method):
+    def wrapper(self, *args, **kwargs):
+        FT.invalidate()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+class ChildList(list):
+    """
+    List of children of an FT node, modifying it invalidates the cached query results of all fault trees
+    """
+    __slots__ = ()
+
+    append = _invalidating(list.append)
+    extend = _invalidating(list.extend)
+    insert = _invalidating(list.insert)
+    pop = _invalidating(list.pop)
+    remove = _invalidating(list.remove)
+    clear = _invalidating(list.clear)
+    sort = _invalidating(list.sort)
+    reverse = _invalidating(list.reverse)
+    __setitem__ = _invalidating(list.__setitem__)
+    __delitem__ = _invalidating(list.__delitem__)
+    __iadd__ = _invalidating(list.__iadd__)
+    __imul__ = _invalidating(list.__imul__)
+
+
 class FT:
+    # Nodes have a fixed set of slots instead of an attribute dict, large fault trees hold many of them.
+    # The type is stored as its small-int code, the type property gives the FtElementType.
+    __slots__ = ("name", "_type", "children", "prob", "cost", "_cache")
+
+    # Cached query results are only valid for the generation they were computed in,
+    # every mutation of any FT node starts a new generation.
+    _generation = 0
+
     def __init__(self, name, ftelement, children=None, prob=None, cost=None):
         if children == None:
             children = []
-        self.name = name
-        self.type = ftelement
-        self.children = children
-        self.prob = prob
-        self.cost = cost
+        set_attr = object.__setattr__
+        set_attr(self, "name", name)
+        set_attr(self, "_type", ftelement.value)
+        set_attr(self, "children", ChildList(children))
+        set_attr(self, "prob", prob)
+        set_attr(self, "cost", cost)
+        set_attr(self, "_cache", None)
+
+    def __setattr__(self, key, value):
+        if key == "children" and not isinstance(value, ChildList):
+            value = ChildList(value)
+        object.__setattr__(self, key, value)
+        FT.invalidate()
+
+    @property
+    def type(self):
+        return _FT_TYPES[self._type]
+
+    @type.setter
+    def type(self, ftelement):
+        object.__setattr__(self, "_type", ftelement.value)
+
+    def __getstate__(self):
+        return {key: getattr(self, key) for key in FT.__slots__ if key != "_cache"}
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            object.__setattr__(self, key, value)
+        object.__setattr__(self, "_cache", None)
+
+    @staticmethod
+    def invalidate():
+        """
+        Discards all cached query results, needed only when nodes are changed in a way FT cannot observe
+        """
+        FT._generation += 1
+
+    def _query_cache(self):
+        cache = self._cache
+        if cache is None or cache[0] != FT._generation:
+            cache = (FT._generation, {})
+            object.__setattr__(self, "_cache", cache)
+        return cache[1]
+
+    def _nodes(self):
+        """
+        :return: all distinct nodes (by identity) of the fault tree in post-order, shared subtrees are visited once
+        """
+        cache = self._query_cache()
+        if "nodes" not in cache:
+            cache["nodes"] = list(postorder(self, unique=True))
+        return cache["nodes"]
+
+    def _cached(self, key, compute):
+        cache = self._query_cache()
+        if key not in cache:
+            cache[key] = compute(self._nodes())
+        return cache[key]
 
     def variables(self, ft=None):
         if ft is None:
             ft = self
-
-        if ft.type == FtElementType.BE:
-            return {ft.name}
-
-        variables = set()
-        for child in ft.children:
-            variables.update(self.variables(child))
-        return variables
+        return set(ft._cached("variables", lambda nodes: {n.name for n in nodes if n.type == FtElementType.BE}))
 
     def vertices(self, ft=None):
         if ft is None:
             ft = self
-
-        if ft.type == FtElementType.BE:
-            return {ft.name}
-
-        variables = {ft.name}
-        for child in ft.children:
-            variables.update(self.vertices(child))
-        return variables
+        return set(ft._cached("vertices", lambda nodes: {n.name for n in nodes}))
 
     def probabilities(self, ft=None):
         if ft is None:
             ft = self
-
-        if ft.type == FtElementType.BE:
-            return {ft.name: ft.prob}
-
-        events = {}
-        for child in ft.children:
-            events.update(self.probabilities(child))
-        return events
+        return dict(ft._cached("probabilities", lambda nodes: {n.name: n.prob for n in nodes if n.type == FtElementType.BE}))
 
     def cost_dict(self, ft=None):
         if ft is None:
             ft = self
-
-        if ft.type == FtElementType.BE:
-            return {ft.name: ft.cost}
-
-        events = {}
-        for child in ft.children:
-            events.update(self.cost_dict(child))
-        return events
+        return dict(ft._cached("cost_dict", lambda nodes: {n.name: n.cost for n in nodes if n.type == FtElementType.BE}))
 
     def cut_set(self):
-        cs = self._cut_set(self)
-        return self.reduce_cut_sets(cs)
-
-    def _cut_set(self, ft=None):
-        if ft is None:
-            ft = self
-
-        if ft.type == FtElementType.BE:
-            return [[ft.name]]
-
-        if ft.type == FtElementType.AND:
-            child_cut_sets = [self._cut_set(child) for child in ft.children]
-            result = []
-
-            for combination in product(*child_cut_sets):
-                merged = []
-                for cut in combination:
-                    merged.extend(cut)
-                result.append(sorted(set(merged)))
-            return result
-
-        if ft.type == FtElementType.OR:
-            result = []
-            for child in ft.children:
-                new = self._cut_set(child)
-                result += new
-            return result
+        """
+        :return: list of all minimal cut sets, smallest first. The sets are enumerated once per fault tree,
+            every call returns new lists.
+        """
+        return [list(s) for s in self._sorted_sets(dual=False)]
+
+    def cut_set_count(self):
+        bdd, cut_sets = self._minimal_sets(dual=False)
+        return bdd.count(cut_sets)
+
+    def iter_cut_sets(self):
+        """
+        :return: generator that lazily enumerates the minimal cut sets
+        """
+        bdd, cut_sets = self._minimal_sets(dual=False)
+        return bdd.iter_sets(cut_sets)
+
+    def _decision_diagram(self):
+        """
+        :return: BDD manager for the basic events of this fault tree
+        """
+        from .BDD import BDD
+        cache = self._query_cache()
+        if "bdd" not in cache:
+            cache["bdd"] = BDD.for_ft(self)
+        return cache["bdd"]
+
+    def _minimal_sets(self, dual):
+        """
+        Minimal cut sets (or path sets when dual) are computed symbolically from the BDD of the top event
+        :return: BDD manager and the ZDD node of the family of sets
+        """
+        bdd = self._decision_diagram()
+        cache = self._query_cache()
+        key = "path_sets" if dual else "cut_sets"
+        if key not in cache:
+            cache[key] = bdd.minimal_solutions(bdd.build(self, dual=dual))
+        return bdd, cache[key]
 
     def reduce_cut_sets(self, cut_sets):
         unique_sets = set(frozenset(lst) for lst in cut_sets)
@@ -108,153 +183,154 @@ class FT:
         return [list(s) for s in result]
 
     def path_set(self):
-        ps = self._path_set(self)
-        return self.reduce_cut_sets(ps)
-
-    def _path_set(self, ft=None):
+        """
+        :return: list of all minimal path sets, smallest first. The sets are enumerated once per fault tree,
+            every call returns new lists.
+        """
+        return [list(s) for s in self._sorted_sets(dual=True)]
+
+    def _sorted_sets(self, dual):
+        """
+        :return: cached tuple of the minimal cut sets (path sets when dual) as tuples, smallest first
+        """
+        cache = self._query_cache()
+        key = "sorted_path_sets" if dual else "sorted_cut_sets"
+        if key not in cache:
+            bdd, sets = self._minimal_sets(dual)
+            cache[key] = tuple(tuple(s) for s in sorted(bdd.iter_sets(sets), key=len))
+        return cache[key]
+
+    def path_set_count(self):
+        bdd, path_sets = self._minimal_sets(dual=True)
+        return bdd.count(path_sets)
+
+    def iter_path_sets(self):
+        """
+        :return: generator that lazily enumerates the minimal path sets
+        """
+        bdd, path_sets = self._minimal_sets(dual=True)
+        return bdd.iter_sets(path_sets)
+
+    def unreliability(self, ft=None, add_unreliability=False, exact=True):
+        """
+        Probability of the top event
+        :param ft: fault tree, self if not given
+        :param add_unreliability: store the unreliability of every gate in its prob
+        :param exact: account for shared nodes (DAG) by evaluating the BDD of the fault tree,
+            trees are always evaluated with the linear bottom-up product
+        :return: unreliability of ft
+        """
         if ft is None:
             ft = self
 
-        if ft.type == FtElementType.BE:
-            return [[ft.name]]
-
-        if ft.type == FtElementType.OR:
-            child_cut_sets = [self._path_set(child) for child in ft.children]
-            result = []
-
-            for combination in product(*child_cut_sets):
-                merged = []
-                for cut in combination:
-                    merged.extend(cut)
-                result.append(sorted(set(merged)))
-            return result
-
-        if ft.type == FtElementType.AND:
-            result = []
-            for child in ft.children:
-                new = self._path_set(child)
-                result += new
-            return result
-
-    def unreliability(self, ft=None, add_unreliability=False):
-        if ft is None:
-            ft = self
-        if ft.type == FtElementType.BE:
-            return ft.prob
+        if exact and ft.shape() != "TREE":
+            bdd = ft._decision_diagram()
+            gates = [node for node in ft._nodes() if node.type != FtElementType.BE]
+            bdd_nodes = bdd.build_nodes(ft)
+            values = bdd.probability([bdd_nodes[id(node)] for node in gates], ft.probabilities())
+            if add_unreliability:
+                for node, value in zip(gates, values):
+                    node.prob = value
+            return values[-1] if gates else ft.prob
 
-        if ft.type == FtElementType.AND:
+        def combine(node, child_values):
+            if node.type == FtElementType.BE:
+                return node.prob
             result = 1
-            for child in ft.children:
-                result *= self.unreliability(child, add_unreliability)
+            if node.type == FtElementType.AND:
+                for value in child_values:
+                    result *= value
+            elif node.type == FtElementType.OR:
+                for value in child_values:
+                    result *= (1 - value)
+                result = 1 - result
             if add_unreliability:
-                ft.prob = result
+                node.prob = result
             return result
 
-        if ft.type == FtElementType.OR:
-            result = 1
-            for child in ft.children:
-                result *= (1 - self.unreliability(child, add_unreliability))
-            if add_unreliability:
-                ft.prob = 1-result
-            return 1 - result
+        return evaluate(ft, combine)
 
     def has_cycle(self):
-        visited = set()
-        rec_stack = set()
-
-        def dfs(node):
-            node_id = id(node)
-            if node_id in rec_stack:
-                return True
-            if node_id in visited:
-                return False
-
-            visited.add(node_id)
-            rec_stack.add(node_id)
-
-            for child in getattr(node, "children", []):
-                if dfs(child):
-                    return True
-
-            rec_stack.remove(node_id)
-            return False
-
-        return dfs(self)
+        try:
+            for _ in postorder(self, unique=True):
+                pass
+        except ValueError:
+            return True
+        return False
+
+    def compile(self):
+        """
+        :return: immutable array based representation (CompiledFT) of this fault tree
+        """
+        from .CompiledFT import CompiledFT
+        cache = self._query_cache()
+        if "compiled" not in cache:
+            cache["compiled"] = CompiledFT.from_ft(self)
+        return cache["compiled"]
 
     def find_vertex_by_name(self, name, ft=None):
         if ft is None:
             ft = self
-        if ft.name == name:
-            return ft
-        for child in ft.children:
-            result = self.find_vertex_by_name(name, child)
-            if result is not None:
-                return result
+        for node in preorder(ft):
+            if node.name == name:
+                return node
         return None
 
-
     def shape(self):
-        visited = {}
-
-        def dfs(node):
-            node_id = id(node)
-
-            if node_id in visited:
+        visited = set()
+        for node in preorder(self):
+            if id(node) in visited:
                 return node.name
-
-            visited[node_id] = node.name
-
-            for child in node.children:
-                result = dfs(child)
-                if result is not None:
-                    return result
-            return None
-
-        duplicate = dfs(self)
-        return "TREE" if duplicate is None else duplicate
+            visited.add(id(node))
+        return "TREE"
 
     def max_height(self, ft=None, height = 1):
         if ft is None:
             ft = self
-        if ft.type == FtElementType.BE:
-            return height
-
-        total_height = height
-        for child in ft.children:
-            temp_height = self.max_height(child, height+1)
-            if temp_height > total_height:
-                total_height = temp_height
-        return total_height
+        return height - 1 + ft._cached("max_height", _levels)
 
     def print(self, indent=0, visited=None):
         if visited is None:
             visited = set()
 
-        prefix = " " * indent
-
-        # cycle / shared-node detection
-        if self.name in visited:
-            print(prefix + f"{self.name} (↺ already printed)")
-            return
-
-        visited.add(self.name)
-
-        if self.cost is not None:
-            print(prefix + f"{self.name} prob: {self.prob} cost: {self.cost} (", end="")
-        elif self.prob is not None:
-            print(prefix + f"{self.name} prob: {self.prob} (", end="")
+        stack = [(self, indent)]
+        while stack:
+            node, depth = stack.pop()
+            prefix = " " * depth
+
+            # cycle / shared-node detection
+            if node.name in visited:
+                print(prefix + f"{node.name} (↺ already printed)")
+                continue
+
+            visited.add(node.name)
+
+            if node.cost is not None:
+                print(prefix + f"{node.name} prob: {node.prob} cost: {node.cost} (", end="")
+            elif node.prob is not None:
+                print(prefix + f"{node.name} prob: {node.prob} (", end="")
+            else:
+                print(prefix + f"{node.name} (", end="")
+
+            if node.type == FtElementType.BE:
+                print("BE)")
+            elif node.type == FtElementType.AND:
+                print("AND)")
+            elif node.type == FtElementType.OR:
+                print("OR)")
+
+            stack.extend((child, depth + 1) for child in reversed(node.children))
+
+
+def _levels(nodes):
+    """
+    :param nodes: distinct nodes in post-order, the top event last
+    :return: number of levels of the fault tree formed by the last node
+    """
+    levels = {}
+    for node in nodes:
+        if node.type == FtElementType.BE or not node.children:
+            levels[id(node)] = 1
         else:
-            print(prefix + f"{self.name} (", end="")
-
-        if self.type == FtElementType.BE:
-            print("BE)")
-        elif self.type == FtElementType.AND:
-            print("AND)")
-        elif self.type == FtElementType.OR:
-            print("OR)")
-
-        for child in getattr(self, "children", []):
-            child.print(indent + 1, visited)
-
-
-
+            levels[id(node)] = 1 + max(levels[id(child)] for child in node.children)
+    return levels[id(nodes[-1])]
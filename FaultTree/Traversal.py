@@ -0,0 +1,107 @@
+"""
+Explicit-stack traversals shared by FT and DDT, deep models do not hit the recursion limit.
+Nodes are expected to have a children attribute, unless another children function is given.
+"""
+
+
+def _children(node):
+    return node.children
+
+
+def preorder(root, children=_children, unique=False, key=id):
+    """
+    Yields every node before its children, children from left to right. Shared nodes are yielded once per path.
+    :param root: node to start from
+    :param children: function returning the children of a node
+    :param unique: yield shared nodes only once, at their first occurrence
+    :param key: identity of a node when unique is set
+    """
+    visited = set()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if unique:
+            k = key(node)
+            if k in visited:
+                continue
+            visited.add(k)
+        yield node
+        stack.extend(reversed(children(node)))
+
+
+def preorder_with_depth(root, children=_children):
+    """
+    Same as preorder, but yields (node, depth) pairs where the root has depth 0
+    """
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        yield node, depth
+        stack.extend((child, depth + 1) for child in reversed(children(node)))
+
+
+def postorder(root, children=_children, unique=False, key=id):
+    """
+    Yields every node after its children, children from left to right.
+    :param root: node to start from
+    :param children: function returning the children of a node
+    :param unique: yield shared nodes only once, raises a ValueError when the structure contains a cycle
+    :param key: identity of a node when unique is set
+    """
+    visited = set()
+    open_nodes = set()
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            if unique:
+                open_nodes.discard(key(node))
+            yield node
+            continue
+        if unique:
+            k = key(node)
+            if k in visited:
+                if k in open_nodes:
+                    raise ValueError("structure contains a cycle")
+                continue
+            visited.add(k)
+            open_nodes.add(k)
+        stack.append((node, True))
+        for child in reversed(children(node)):
+            if not unique or key(child) not in visited or key(child) in open_nodes:
+                stack.append((child, False))
+
+
+def evaluate(root, combine, children=_children):
+    """
+    Bottom-up evaluation where every distinct node is evaluated once
+    :param root: node to start from
+    :param combine: function (node, list of child values) -> value of node
+    :param children: function returning the children of a node
+    :return: value of root
+    """
+    values = {}
+    for node in postorder(root, children, unique=True):
+        values[id(node)] = combine(node, [values[id(child)] for child in children(node)])
+    return values[id(root)]
+
+
+def run_recursive(call):
+    """
+    Runs a recursive algorithm on an explicit stack. The algorithm is written as a generator function that
+    yields the generator of every recursive call and receives its result, e.g. value = yield self._apply(f, g).
+    :param call: generator of the top level call
+    :return: value returned by the top level call
+    """
+    stack = [call]
+    value = None
+    while stack:
+        try:
+            sub_call = stack[-1].send(value)
+        except StopIteration as stop:
+            stack.pop()
+            value = stop.value
+            continue
+        stack.append(sub_call)
+        value = None
+    return value
@@ -1,7 +1,7 @@
 import numpy as np
 
 from Experiments.CombinedAlgorithms.run import run_with_timeout, apply_algorithm_BarraCuDA
-from FaultTree.FT_random_generator import FaultTreeGenerator, save_ft
+from FaultTree.FT_random_generator import generate_batch
 from FaultTree.FTintoDAG import *
 from FaultTree.FTadapt import convert_all_fault_trees
 from Experiments.AdaptingAlgorithms.run import run_experiments
@@ -39,8 +39,6 @@ def clean_folder(folder_path: str):
             print(f"Could not delete {item_path}: {e}")
 
 def generate_fts(cfg):
-    ft_paths = []
-
     exp_cfg = cfg["experiment"]
     gen_cfg = cfg.get("ft_generation", {})
     path_cfg = cfg["paths"]
@@ -54,20 +52,18 @@ def generate_fts(cfg):
     ft_dir = os.path.join(path_cfg["base_dir"], "fts")
     os.makedirs(ft_dir, exist_ok=True)
 
+    specs = []
     for be in range(be_start, be_end):
         for i in range(1, n_per_size + 1):
 
             or_p = np.random.uniform(*or_range)
             max_children = np.random.randint(*maxc_range)
 
-            gen = FaultTreeGenerator(or_prob=or_p)
-            ft = gen.generate_FT(be, max_children=max_children)
-
             filename = f"be{be}_ft{i}_orp{or_p:.2f}_mc{max_children}.dft"
-            path = os.path.join(ft_dir, filename)
+            specs.append((filename, be, or_p, max_children))
 
-            save_ft(ft, path)
-            ft_paths.append(path)
+    # the trees are generated in bulk, reproducibly from the seed of the experiment
+    ft_paths = generate_batch(specs, ft_dir, seed=cfg.get("seed"), workers=gen_cfg.get("workers"))
 
     return ft_paths
 
@@ -208,10 +204,8 @@ def run_exp3(cfg):
             # -------------------------
             out_path = os.path.join(ft_output_folder, f"temp_{i}.dft")
 
-            ft = random_gen(base_folder, min_size, out_path)
-
-            # random_gen already saves temp; re-save properly
-            FTsave(ft[0], ft[1], out_path)
+            # random_gen writes the combined fault tree to out_path
+            random_gen(base_folder, min_size, out_path)
     clean_folder(cfg["paths"]["results_dir"])
     run_barracuda_experiment(cfg)
 